@@ -0,0 +1,125 @@
+"""
+Feed recorded-like Slynk traffic to `SlynkClientProtocol` in random chunk sizes.
+
+The previous framing (`+=` on the partial message and one recursive call
+per extra packet in a chunk) is kept below as the baseline.  It cannot
+cope with a header split across chunks nor with long bursts of packets,
+which is reported instead of a timing.
+
+    python benchmarks/framing.py [--quick]
+"""
+import random
+import sys
+import time
+
+import traffic
+from slynk.client import SlynkClientProtocol
+
+
+class LegacyProtocol(SlynkClientProtocol):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.partial_message = None
+
+    def complete_data(self, data):
+        if self.partial_message is None:
+            packet_size = int(data[0:6].decode("utf-8"), 16)
+            if len(data) - 6 < packet_size:
+                self.partial_message = data
+                return None
+            else:
+                return data
+        else:
+            self.partial_message += data
+            packet_size = int(self.partial_message[0:6].decode("utf-8"), 16)
+            if len(self.partial_message) - 6 < packet_size:
+                return None
+            else:
+                data = self.partial_message
+                self.partial_message = None
+                return data
+
+    def data_received(self, data):
+        data = self.complete_data(data)
+        if data is None:
+            return
+        packet_size = int(data[0:6].decode("utf-8"), 16)
+        self.emit("reception", data[6:packet_size + 6])
+        remainder = data[packet_size + 6:]
+        if len(remainder) > 5:
+            self.data_received(remainder)
+
+
+class Counter:
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+
+    def on_reception(self, data):
+        self.messages += 1
+        self.bytes += len(data)
+
+
+def chunks(stream, sizes, seed=0):
+    rng = random.Random(seed)
+    result = []
+    position = 0
+    while position < len(stream):
+        size = rng.choice(sizes)
+        result.append(stream[position:position + size])
+        position += size
+    return result
+
+
+def run(protocol_class, pieces):
+    protocol = protocol_class()
+    counter = Counter()
+    protocol.bind(reception=counter.on_reception)
+    start = time.perf_counter()
+    for piece in pieces:
+        protocol.data_received(piece)
+    return time.perf_counter() - start, counter
+
+
+SCENARIOS = [
+    ("write-string flood", lambda scale: traffic.write_strings(20000 * scale)),
+    ("large reply", lambda scale: [traffic.reply((10 << 20) * scale // 4)]),
+    ("mixed", lambda scale: traffic.write_strings(5000 * scale)
+                            + [traffic.reply(200 << 10, kind)
+                               for kind in traffic.GENERATORS] * scale),
+]
+CHUNK_SIZES = [("small", [1, 7, 64, 512]),
+               ("socket", [1024, 4096, 16384, 65536, 262144])]
+
+
+def main(quick=False):
+    scale = 1 if quick else 4
+    print(f"{'scenario':<20}{'chunks':<8}{'protocol':<10}"
+          f"{'time':>11}{'msg/s':>12}{'speedup':>9}")
+    for name, messages in SCENARIOS:
+        messages = messages(scale)
+        stream = b"".join(traffic.frame(m) for m in messages)
+        for chunk_label, sizes in CHUNK_SIZES:
+            pieces = chunks(stream, sizes)
+            baseline = None
+            for label, protocol_class in [("legacy", LegacyProtocol),
+                                          ("current", SlynkClientProtocol)]:
+                try:
+                    seconds, counter = run(protocol_class, pieces)
+                except (RecursionError, ValueError) as error:
+                    print(f"{name:<20}{chunk_label:<8}{label:<10}"
+                          f"{type(error).__name__:>11}")
+                    continue
+                if counter.messages != len(messages):
+                    print(f"{name:<20}{chunk_label:<8}{label:<10}"
+                          f"{'lost ' + str(len(messages) - counter.messages):>11}")
+                    continue
+                baseline = baseline or seconds
+                print(f"{name:<20}{chunk_label:<8}{label:<10}"
+                      f"{seconds * 1000:>9.1f}ms"
+                      f"{counter.messages / seconds:>12.0f}"
+                      f"{baseline / seconds:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main("--quick" in sys.argv)
@@ -0,0 +1,169 @@
+"""
+Replay Slynk traffic against a real `SlynkClient`, without a Lisp.
+
+A local replay server stands in for Slynk and plays back the received side
+of a recording, the client side is driven from the sent side.  Without
+arguments synthetic recordings are used (REPL flood, large inspections,
+backtraces, completion storm); `--recording` replays a capture made with
+the "Sly: Start/stop recording the Slynk traffic" command.
+
+    python benchmarks/replay.py [--quick] [--time-scale X] [--recording FILE]
+
+`--time-scale` multiplies the recorded pauses, 0 (the default) replays as
+fast as possible and 1 with the original timing.
+"""
+import argparse
+import asyncio
+import re
+import time
+
+import traffic
+from sexpdata import loads
+from slynk.slynk import SlynkClient
+from slynk.metrics import Histogram
+from slynk.recording import Script, serve_replay, RECEIVED, SENT
+from slynk.util import Repl
+
+CHUNK_SIZE = 1 << 16
+LATENCY = 0.001
+REX = re.compile(r'\(:EMACS-REX \((.*)\) ("(?:[^"\\]|\\.)*"|\S+) (\S+) (\d+)\)', re.S)
+CHANNEL = re.compile(rb'\(:CHANNEL-SEND (\d+) ', re.I)
+
+
+def rex(command, id, package="COMMON-LISP-USER"):
+    return f'(:EMACS-REX ({command}) "{package}" T {id})'
+
+
+def synthetic(exchanges):
+    """Records of a session made of `(requests, replies)` exchanges, the
+    replies coming in socket-sized chunks `LATENCY` after the requests."""
+    records = []
+    elapsed = 0.0
+    for requests, replies in exchanges:
+        for request in requests:
+            records.append((SENT, elapsed, traffic.frame(request)))
+        elapsed += LATENCY
+        stream = b"".join(traffic.frame(reply) for reply in replies)
+        for start in range(0, len(stream), CHUNK_SIZE):
+            records.append((RECEIVED, elapsed, stream[start:start + CHUNK_SIZE]))
+        elapsed += LATENCY
+    return records
+
+
+def repl_flood(scale):
+    lines = traffic.write_strings(20000 * scale)
+    return synthetic([(['(:EMACS-CHANNEL-SEND 1 (:PROCESS "(dotimes (i 20000) (print i))"))'],
+                       lines + ['(:CHANNEL-SEND 1 (:WRITE-VALUES (("NIL" 1 NIL))))'])])
+
+
+def replies(kind, count, size, command):
+    return synthetic([([rex(command, id)], [traffic.reply(size, kind, id, id)])
+                      for id in range(1, count + 1)])
+
+
+SCENARIOS = {
+    "repl flood": repl_flood,
+    "inspections": lambda scale: replies(
+        "inspection", 10 * scale, 200 << 10, 'SLYNK:INIT-INSPECTOR "*FOO*"'),
+    "backtraces": lambda scale: replies(
+        "backtrace", 20 * scale, 100 << 10, "SLYNK:BACKTRACE 0 NIL"),
+    "completion storm": lambda scale: replies(
+        "completion", 500 * scale, 2 << 10,
+        'SLYNK-COMPLETION:FLEX-COMPLETIONS (QUOTE "m-h") "COMMON-LISP-USER"'),
+}
+
+
+class ReplayClient(SlynkClient):
+    """Counts the messages handled, so that the driver can follow the recording."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.handled = 0
+        self.progress = asyncio.Event()
+
+    async def handle_read(self, data):
+        await super().handle_read(data)
+        self.handled += 1
+        self.progress.set()
+
+    async def handled_at_least(self, count):
+        while self.handled < count:
+            self.progress.clear()
+            await self.progress.wait()
+
+
+async def replay(script, time_scale=0.0):
+    loop = asyncio.get_event_loop()
+    server = await serve_replay(script, time_scale=time_scale)
+    client = ReplayClient("localhost", server.sockets[0].getsockname()[1])
+    repls = []
+    for __, message in script.received:
+        if match := CHANNEL.match(message):
+            while len(client.channels) <= int(match.group(1)):
+                repls.append(Repl(client.make_channel()[1], True))
+    await client.open_connexion(loop)
+    start = time.perf_counter()
+    futures = []
+    previous = 0.0
+    for elapsed, needed, message in script.requests:
+        await client.handled_at_least(needed)
+        if time_scale and elapsed > previous:
+            await asyncio.sleep((elapsed - previous) * time_scale)
+        previous = elapsed
+        message = message.decode("utf-8")
+        if match := REX.fullmatch(message):
+            command, package, thread, id = match.groups()
+            client.request_counter = int(id)
+            message, request = client.rex_request(command, thread, loads(package))
+            size = client.send_message(message)
+            client.metrics.request_sent(request, 0.0, size)
+            futures.append(request.future)
+        else:
+            client.send_message(message)
+    await client.handled_at_least(len(script.received))
+    await asyncio.gather(*futures, return_exceptions=True)
+    seconds = time.perf_counter() - start
+    await client.closed()
+    server.close()
+    await server.wait_closed()
+    return client, seconds
+
+
+def report(name, client, seconds):
+    metrics = client.metrics
+    count = sum(message.count for message in metrics.messages.values())
+    parse_time = sum(message.parse_time for message in metrics.messages.values())
+    latency = Histogram()
+    for rpc in metrics.rpcs.values():
+        latency.merge(rpc.latency)
+
+    def ms(microseconds):
+        return "-" if microseconds is None else f"{microseconds / 1000:.2f}ms"
+
+    print(f"{name:<20}{count:>9}{count / seconds:>11.0f}"
+          f"{parse_time / count * 1e6 if count else 0:>11.1f}"
+          f"{latency.total:>7}{ms(latency.percentile(50)):>10}"
+          f"{ms(latency.percentile(99)):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true")
+    parser.add_argument("--time-scale", type=float, default=0.0)
+    parser.add_argument("--recording")
+    arguments = parser.parse_args()
+    if arguments.recording:
+        scripts = [(arguments.recording, Script.load(arguments.recording))]
+    else:
+        scale = 1 if arguments.quick else 4
+        scripts = [(name, Script(records(scale)))
+                   for name, records in SCENARIOS.items()]
+    print(f"{'scenario':<20}{'messages':>9}{'msg/s':>11}{'parse µs':>11}"
+          f"{'rex':>7}{'p50':>10}{'p99':>10}")
+    loop = asyncio.get_event_loop()
+    for name, script in scripts:
+        client, seconds = loop.run_until_complete(replay(script, arguments.time_scale))
+        report(name, client, seconds)
+
+
+if __name__ == "__main__":
+    main()
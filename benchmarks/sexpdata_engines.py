@@ -0,0 +1,54 @@
+"""
+Compare the `sexpdata` parser engines on Slynk replies of 1 KB, 100 KB and 10 MB.
+
+Every engine starts from the encoded packet, as `SlynkClient.handle_read`
+does: the text engines decode it first, the bytes engine parses it in place.
+
+    python benchmarks/sexpdata_engines.py [--quick]
+"""
+import sys
+import timeit
+
+import traffic
+import sexpdata
+
+SIZES = [("1 KB", 1 << 10), ("100 KB", 100 << 10), ("10 MB", 10 << 20)]
+KINDS = ["apropos", "backtrace", "trace"]
+
+
+def measure(function, budget):
+    timer = timeit.Timer(function)
+    number, elapsed = timer.autorange()
+    if elapsed < budget:
+        number = max(1, int(number * budget / elapsed))
+    return min(timer.repeat(3, number)) / number
+
+
+def main(quick=False):
+    sizes = SIZES[:2] if quick else SIZES
+    print(f"{'reply':<18}{'engine':<11}{'time':>12}{'MB/s':>10}{'speedup':>9}")
+    for kind in KINDS:
+        for label, size in sizes:
+            message = traffic.reply(size, kind).encode("utf-8")
+            baseline = reference = None
+            for engine in sexpdata.PARSERS:
+                if engine == "bytes":
+                    def load():
+                        return sexpdata.loads_bytes(memoryview(message))
+                else:
+                    def load():
+                        return sexpdata.loads(message.decode("utf-8"),
+                                              engine=engine)
+                if reference is None:
+                    reference = load()
+                assert load() == reference
+                seconds = measure(load, 0.2)
+                baseline = baseline or seconds
+                print(f"{kind + ' ' + label:<18}{engine:<11}"
+                      f"{seconds * 1000:>10.3f}ms"
+                      f"{len(message) / seconds / 1e6:>10.1f}"
+                      f"{baseline / seconds:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main("--quick" in sys.argv)
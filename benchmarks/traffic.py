@@ -0,0 +1,83 @@
+"""
+Synthetic Slynk traffic for the benchmarks.
+
+The replies mimic what Slynk actually sends for the heavy operations
+(apropos listings, backtraces, trace trees) so that the parsers see a
+realistic mix of keywords, strings, numbers and nesting.
+"""
+import random
+import sys
+import pathlib
+
+SOURCE = pathlib.Path(__file__).resolve().parent.parent / "src"
+if str(SOURCE) not in sys.path:
+    sys.path.insert(0, str(SOURCE))
+
+
+def apropos_entry(rng, index):
+    name = "-".join(rng.choice(["MAKE", "HASH", "TABLE", "FOO", "BAR", "WITH",
+                                "SLOT", "VALUE", "STREAM", "%INTERNAL"])
+                    for __ in range(rng.randint(1, 4)))
+    return (f'(:DESIGNATOR "{name}-{index}" :FUNCTION '
+            f'"Documentation for \\"{name}\\" number {index}." '
+            f':BOUNDP NIL :ARGLIST "(X &KEY (TEST (QUOTE EQL)))")')
+
+
+def backtrace_frame(rng, index):
+    return (f'({index} "(FOO::FRAME-{index} #<HASH-TABLE :TEST EQL :COUNT '
+            f'{rng.randint(0, 999)} {{1004A2B3C3}}> {rng.random():.5f})" '
+            f'(:RESTARTABLE {rng.choice(["T", "NIL"])}))')
+
+
+def trace_entry(rng, index):
+    return (f'({index} {max(0, index - rng.randint(1, 3))} '
+            f'(FOO::WORKER 1 "FOO::WORKER") ((0 "{rng.randint(0, 10**6)}") '
+            f'(1 "\\"payload {index}\\"")) ((0 "NIL")))')
+
+
+def inspection_entry(rng, index):
+    return (f'"Slot {index}: " (:VALUE "#<STANDARD-OBJECT FOO-{rng.randint(0, 999)} '
+            f'{{10042{index:05X}}}>" {index}) (:NEWLINE)')
+
+
+def completion_entry(rng, index):
+    name = "-".join(rng.choice(["MAKE", "HASH", "TABLE", "WITH", "SLOT", "VALUE"])
+                    for __ in range(rng.randint(1, 4)))
+    return (f'("{name.lower()}-{index}" {rng.random():.4f} ((0 "m") (5 "h")) '
+            f'"{rng.choice(["fn", "generic-fn", "var", "macro", "type"])}")')
+
+
+GENERATORS = {
+    "apropos": apropos_entry,
+    "backtrace": backtrace_frame,
+    "trace": trace_entry,
+    "inspection": inspection_entry,
+    "completion": completion_entry,
+}
+
+
+def reply(size, kind="apropos", seed=0, id=1):
+    """An `(:RETURN (:OK ...) id)` reply of roughly `size` characters."""
+    rng = random.Random(seed)
+    generate = GENERATORS[kind]
+    entries = []
+    length = 0
+    while length < size:
+        entry = generate(rng, len(entries))
+        entries.append(entry)
+        length += len(entry) + 1
+    return f"(:RETURN (:OK ({' '.join(entries)})) {id})"
+
+
+def write_strings(count, seed=0, channel=1):
+    """`count` channel `:WRITE-STRING` messages, as a REPL flood would send."""
+    rng = random.Random(seed)
+    return [f'(:CHANNEL-SEND {channel} (:WRITE-STRING "line {n}: '
+            f'{"x" * rng.randint(0, 80)}\n"))'
+            for n in range(count)]
+
+
+def frame(message):
+    """Frame a message the way Slynk puts it on the wire."""
+    payload = message.encode("utf-8")
+    return f"{len(payload):06X}".encode("utf-8") + payload
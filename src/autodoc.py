@@ -0,0 +1,48 @@
+from sublime import *
+import sublime_plugin, asyncio
+
+from . import sly, util
+
+
+class SlyAutodocListener(sublime_plugin.ViewEventListener):
+    """Shows the arglist of the operator around the cursor in the status bar."""
+    def on_selection_modified_async(self):
+        view = self.view
+        settings = sly.settings().get("autodoc")
+        if not settings or not settings.get("enabled"):
+            return
+        if not util.in_lisp_file(view, sly.settings) or len(view.sel()) == 0:
+            return
+        session = sly.sessions.get_by_window(view.window(), indicate_failure=False)
+        if session is None: return
+        point = view.sel()[0].begin()
+        # A bounded scan around the cursor, unlike `find_toplevel_form`
+        # which may search the whole buffer
+        try:
+            region = util.find_containing_form(view, point)
+        except Exception:
+            region = None
+        # Only the text before the cursor matters, however large the form
+        if region is None or not region.begin() < point <= region.end():
+            view.erase_status("sly-autodoc")
+            return
+        text = view.substr(Region(region.begin(), point))
+        package = util.current_package(view, point) or "COMMON-LISP-USER"
+        asyncio.run_coroutine_threadsafe(
+            self.async_run(session, text, package, settings.get("delay", 0.15)),
+            sly.loop)
+
+    async def async_run(self, session, text, package, delay):
+        try:
+            documentation = await session.slynk.autodoc_soon(
+                text, len(text), "T", package, delay)
+        except Exception as e:
+            print(f"Autodoc exception: {e}")
+            return
+        # Superseded by a later cursor move
+        if documentation is None:
+            return
+        if str(documentation).upper() == ":NOT-AVAILABLE":
+            self.view.erase_status("sly-autodoc")
+        else:
+            self.view.set_status("sly-autodoc", str(documentation))
@@ -81,11 +81,22 @@ def create_completion_item(completion, classifier):
         annotation=annotation,
         details=f'<a href=\'subl:sly_completion_info {{"completion": "{name}"}}\'> M</a>atch: {int(completion.probability*1000)} ‰')
 
+# syntax -> (classifier settings, compiled classifier)
+CLASSIFIERS: Dict[str, Tuple[List[Dict], Classifier]] = {}
+
 def get_classifier(syntax: str) -> Classifier:
     classifiers = sly.settings().get("completion")["classifiers"]
+    # Only recompiled when the settings change
+    if (memo := CLASSIFIERS.get(syntax)) and memo[0] == classifiers:
+        return memo[1]
     for classifier in classifiers:
         if re.findall(classifier["syntax_regex"], syntax):
-            return convert_classifier(classifier)
+            classifier = convert_classifier(classifier)
+            break
+    else:
+        classifier = None
+    CLASSIFIERS[syntax] = (classifiers, classifier)
+    return classifier
 
 def convert_classifier(classifier: Dict) -> Classifier:
     def prepare_classification(classification) -> Classification:
@@ -1,51 +1,70 @@
 from .html_dsl.elements import *
+from .util import load_resource
+
+# HTML that is the same in all the views, rendered once per (re)load of
+# the package, as reloading runs this module again.
+FRAGMENTS = {}
+
+def fragment(key, make):
+    """The HTML made by `make`, made for the first `key` only."""
+    try:
+        return FRAGMENTS[key]
+    except KeyError:
+        html = FRAGMENTS[key] = str(make())
+        return html
+
+def stylesheet():
+    """The stylesheet of the views, as a `STYLE` element's HTML."""
+    return fragment("stylesheet", lambda: STYLE[load_resource("stylesheet.css")])
 
 class Button(BaseHtmlElement):
-    def __str__(self):
+    tag = "span"
+
+    def tag_attributes(self):
+        attributes = dict(self.attributes)
+        attributes["class"] = attributes.get("class", "") + "sly button"
+        return attributes
+
+    def open_tag(self):
         href = self.attributes["href"] if "href" in self.attributes else ""
-        if "class" not in self.attributes:
-            self.attributes["class"] = ""
-        self.attributes["class"] += "sly button"
-        return str(SPAN(**self.attributes)[
-            A(href=href)[[child for child in self]]
-        ])
+        return super().open_tag() + f"<a href='{href}'>"
+
+    def close_tag(self):
+        return "</a></span>"
 
 
 class Checkbox(BaseHtmlElement):
-    def __str__(self):
-        href = self.attributes["href"] if "href" in self.attributes else ""
-        if "class" not in self.attributes:
-            self.attributes["class"] = ""
-        self.attributes["class"] += "sly checkbox"
-        is_checked = ("checked" in self.attributes) and self.attributes["checked"]
-        if is_checked:
-            self.attributes["class"] += " checked"
-        return str(
-            A(**self.attributes)[
-                SPAN["✓" if is_checked else "&nbsp;"]
-        ])
+    tag = "a"
+
+    def is_checked(self):
+        return ("checked" in self.attributes) and self.attributes["checked"]
+
+    def tag_attributes(self):
+        attributes = dict(self.attributes)
+        attributes["class"] = attributes.get("class", "") + "sly checkbox"
+        if self.is_checked():
+            attributes["class"] += " checked"
+        return attributes
+
+    def open_tag(self):
+        return super().open_tag() + f"<span>{'✓' if self.is_checked() else '&nbsp;'}</span>"
+
+    def rendered_children(self):
+        return ()
 
 class RenamedSpan(BaseHtmlElement):
-    def __str__(self):
-        previous = self.name
-        self.name = "span"
-        result = super().__str__()
-        self.name = previous
-        return result
+    tag = "span"
 
 class Details(BaseHtmlElement):
-    def __str__(self):
+    tag = "div"
+
+    def rendered_children(self):
         if "open" in self.attributes:
-            element = DIV(**self.attributes)
-            element += self
-            return str(element)
-        else:
-            return str(DIV(**self.attributes)[
-                self[0] if (len(self) > 0 and isinstance(self[0], BaseHtmlElement) 
-                                          and "SUMMARY" in self[0].name.upper()) 
-                        else ""
-            ])
+            return self
+        return self[:1] if (len(self) > 0 and isinstance(self[0], BaseHtmlElement)
+                                           and "SUMMARY" in self[0].name.upper()) else ()
+
 BUTTON = Button("x:button")
 CHECKBOX = Checkbox("x:checkbox")
 DETAILS = Details("x:details")
-SUMMARY = RenamedSpan("x:summary")
\ No newline at end of file
+SUMMARY = RenamedSpan("x:summary")
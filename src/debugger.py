@@ -23,6 +23,8 @@ class Debugger(ui.UIView):
         self.session.debuggers[thread] = self
         self.data = None
         self.current_locals = None
+        self.frames_element = None
+        self.more_frames_element = None
 
     def describe(self, index=None):
         return (f"Error: {self.data.title}\n"
@@ -39,7 +41,7 @@ class Debugger(ui.UIView):
         affixes = sly.settings().get("debugger")["header_affixes"]
 
         self.html = HTML[BODY(_class="sly sly-debugger")[
-            STYLE[util.load_resource("stylesheet.css")],
+            X.stylesheet(),
             H1[escape(affixes[0]+str(data.level)+affixes[1])],
             H2[escape(data.title)],
             H3[escape(data.type), " in thread ", escape(str(data.thread))],
@@ -49,8 +51,11 @@ class Debugger(ui.UIView):
             H4["Restarts"],
             (restarts := OL(start="0")),
             H4["Backtrace"],
-            (frames := OL(start="1"))
+            (frames := OL(start="1")),
+            (more_frames := DIV[" "])
         ]]
+        self.frames_element = frames
+        self.more_frames_element = more_frames
         # Restarts
         for index, restart in enumerate(data.restarts):
             label = restart[0].lower().capitalize()
@@ -66,18 +71,24 @@ class Debugger(ui.UIView):
                     escape(restart[1])
                 ]]]
         #Stack frames:
-        for frame in data.stack_frames:
-            frames += [LI(value=index, id=f"frame-{frame.index}")[
-                X.DETAILS[
-                    X.SUMMARY[
-                        A(href=self.url({"action":"frame", "index":frame.index}), 
-                          _class="stack_frame")[
-                            escape(frame.description)
-                        ]
+        self.add_frames(data.stack_frames)
+        self.flip()
+
+    def add_frames(self, stack_frames):
+        self.frames_element += [LI(value=frame.index, id=f"frame-{frame.index}")[
+            X.DETAILS[
+                X.SUMMARY[
+                    A(href=self.url({"action":"frame", "index":frame.index}), 
+                      _class="stack_frame")[
+                        escape(frame.description)
                     ]
                 ]
-            ]]
-        self.flip()
+            ]
+        ] for frame in stack_frames]
+        self.more_frames_element[0] = (
+            " " if self.data.stack_frames.complete else
+            A(_class="sly-debugger-more", href=self.url({"action": "more-frames"}))[
+                f"↓ Load more frames ({len(self.data.stack_frames)} shown)"])
 
     async def on_url_press(self, action, index=None, **rest):
       try:
@@ -94,7 +105,8 @@ class Debugger(ui.UIView):
                 await slynk.debug_stack_frame_details(
                     index,
                     self.data.stack_frames,
-                    self.data.thread)
+                    self.data.thread,
+                    level=self.data.level)
                 element.attributes["open"] = "open"
                 element.attributes["downloaded"] = "downloaded"
                 element += [
@@ -113,6 +125,11 @@ class Debugger(ui.UIView):
                 ]
                 self.current_locals = self.data.stack_frames[index].locals
             self.flip()
+        elif action == "more-frames":
+            if self.data.stack_frames.fetching:
+                return
+            self.add_frames(await slynk.debug_more_frames(self.data.stack_frames, self.data.thread))
+            self.flip()
         elif action == "frame-describe":
             set_timeout(lambda: self.window.run_command("sly_describe",
                 {"query": self.current_locals[index].value,
@@ -125,10 +142,11 @@ class Debugger(ui.UIView):
                 should_fold= True,
                 result=await slynk.debug_disassemble_frame(
                     index,
-                    self.data.thread
+                    self.data.thread,
+                    level=self.data.level
                 ))
         elif action == "locate-frame":
-            result = await slynk.debug_frame_source(index, self.data.thread)
+            result = await slynk.debug_frame_source(index, self.data.thread, level=self.data.level)
             if result.file:
                 print(result.position.offset)
                 util.open_file_at(self.window, result.file, result.position.offset)
@@ -193,7 +211,7 @@ class Debugger(ui.UIView):
     def returned(self, data):
       try:
         self.html = HTML[BODY(_class="sly sly-debugger")[
-            STYLE[util.load_resource("stylesheet.css")],
+            X.stylesheet(),
             f"Debugger for thread {data.thread}, no current condition being debugged."
         ]]
         self.flip()
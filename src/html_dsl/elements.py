@@ -13,14 +13,62 @@ def flatten(source: Any):
         yield source
 
 
+class Attributes(dict):
+    """The attributes of an element, which is rendered again when they change."""
+    __slots__ = ("element",)
+
+    def __init__(self, element):
+        super().__init__()
+        self.element = element
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.element.changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.element.changed()
+
+    def clear(self):
+        super().clear()
+        self.element.changed()
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self.element.changed()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self.element.changed()
+        return item
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.element.changed()
+
+
 class BaseHtmlElement(list):
+    """An HTML element, a list of its children.
+
+    Each element keeps its serialization, which is dropped along with its
+    ancestors' when its children or attributes change, so rendering again
+    only serializes what changed.  An element belongs to a single tree:
+    a change is only seen by the last element it was added to."""
     def __init__(self, name: str, single: bool = False, no_content: bool = False):
         self.name = name
-        self.attributes: dict = {}
+        self.attributes: Attributes = Attributes(self)
         self.parent: Optional[BaseHtmlElement] = None
         self.single = single
         self.is_created = False
         self.no_content = no_content
+        # The serialized element, None until rendered and after a change
+        self.rendered: Optional[str] = None
 
     def __call__(self, *args, **attributes) -> "BaseHtmlElement":
         element = type(self)(self.name)
@@ -44,11 +92,7 @@ class BaseHtmlElement(list):
             return self.get_element_by_id(children)
         element = type(self)(self.name)
         element.attributes.update(self.attributes)
-        true_children = list(flatten(children))
-        for one in true_children:
-            if isinstance(one, BaseHtmlElement):
-                one.parent = element
-        element.extend(true_children)
+        element.extend(children)
         element.single = self.single
         element.no_content = self.no_content
         element.is_created = True
@@ -60,17 +104,70 @@ class BaseHtmlElement(list):
             
         element = type(self)(self.name)
         element.attributes.update(self.attributes)
-        true_children = list(flatten(addend))
-        for one in true_children:
-            if isinstance(one, BaseHtmlElement):
-                one.parent = element
-        element.extend(self)
-        element.extend(true_children)
+        # The children of `self` are shared, and stay its own
+        super(BaseHtmlElement, element).extend(self)
+        element.extend(addend)
         element.single = self.single
         element.no_content = self.no_content
         element.is_created = self.is_created
         return element
-        
+
+    # Changes
+
+    def changed(self):
+        """Drops the serialization of the element and of its ancestors."""
+        element = self
+        # Unrendered elements have no rendered ancestors depending on them
+        while element is not None and element.rendered is not None:
+            element.rendered = None
+            element = element.parent
+
+    def adopt(self, children) -> list:
+        children = list(flatten(children))
+        for child in children:
+            if isinstance(child, BaseHtmlElement):
+                child.parent = self
+        return children
+
+    def append(self, child):
+        self.extend([child])
+
+    def extend(self, children):
+        super().extend(self.adopt(children))
+        self.changed()
+
+    def __iadd__(self, children):
+        self.extend(children)
+        return self
+
+    def insert(self, index, child):
+        self[index:index] = [child]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = self.adopt(value)
+        elif isinstance(value, BaseHtmlElement):
+            value.parent = self
+        super().__setitem__(index, value)
+        self.changed()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self.changed()
+
+    def clear(self):
+        super().clear()
+        self.changed()
+
+    def pop(self, *args):
+        child = super().pop(*args)
+        self.changed()
+        return child
+
+    def remove(self, child):
+        super().remove(child)
+        self.changed()
+
     @property
     def level(self):
         return self.parent.level + 1 if self.parent else 0
@@ -84,17 +181,71 @@ class BaseHtmlElement(list):
             return f"{blank}{self.name}{attributes}"
         return f"{blank}{self.name}{attributes}[\n{children}]"
 
+    # Rendering, subclasses may override the parts below
+
+    @property
+    def tag(self):
+        return self.name
+
+    def tag_attributes(self) -> dict:
+        return self.attributes
+
+    def open_tag(self) -> str:
+        attributes = self.tag_attributes()
+        attributes = " {}".format(" ".join(f"""{key.replace("_", "-")}='{str(attributes[key])}'""" for key in attributes)) if attributes else ""
+        if self.no_content and not self.single:
+            return f"<{self.tag}{attributes} \\>"
+        return f"<{self.tag}{attributes}>"
+
+    def close_tag(self) -> str:
+        return f"</{self.tag}>"
+
+    def rendered_children(self):
+        return self
+
     def __str__(self):
-        blank = "" * self.level
-        if "hidden" in self.attributes:
-            return ""
-        attributes = " {}".format(" ".join(f"""{key.replace("_", "-")}='{str(self.attributes[key])}'""" for key in self.attributes)) if self.attributes else ""
-        children = "".join(str(child) if isinstance(child, BaseHtmlElement) else blank + str(child) for child in self)        
-        if self.single:
-            return f"{blank}<{self.name}{attributes}>"
-        elif self.no_content:
-            return f"{blank}<{self.name}{attributes} \>"
-        return f"{blank}<{self.name}{attributes}>{children}{blank}</{self.name}>"
+        if self.rendered is None:
+            self.render()
+        return self.rendered
+
+    def render(self):
+        """Serializes the element, and the elements below it that are not
+        already, in one iterative pass.  Each element's serialization is
+        joined from its parts when it is closed."""
+        parts = []
+        # (element, its children left, index of its first part)
+        stack = []
+
+        def enter(element):
+            if "hidden" in element.attributes:
+                element.rendered = ""
+            elif element.single or element.no_content:
+                element.rendered = element.open_tag()
+            else:
+                parts.append(element.open_tag())
+                stack.append((element, iter(element.rendered_children()), len(parts) - 1))
+                return
+            parts.append(element.rendered)
+
+        enter(self)
+        while stack:
+            element, children, start = stack[-1]
+            for child in children:
+                if not isinstance(child, BaseHtmlElement):
+                    parts.append(str(child))
+                elif child.rendered is not None:
+                    parts.append(child.rendered)
+                else:
+                    enter(child)
+                    if stack[-1][0] is child:
+                        break
+            else:
+                stack.pop()
+                parts.append(element.close_tag())
+                rendered = element.rendered = "".join(parts[start:])
+                del parts[start:]
+                parts.append(rendered)
+        return self.rendered
 
     def get_element_by_id(self, id):
         if self.attributes.get("id", None) == id:
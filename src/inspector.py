@@ -149,11 +149,15 @@ def structure_content(id, content):
     for line in lines]
 
 
-def design(id, inspection):
+def design(id, inspection, content=None, start=None, end=None, first_page=0):
+    """Renders the parts of `inspection` from `start` to `end`, by default
+    those it came with, with links to the others.  `first_page` is the
+    index of the page at `start`, only past the first are there previous
+    parts to link to."""
+    if content is None:
+        content, start, end = inspection.content, inspection.start, inspection.end
     return HTML[BODY(id="sly-inspector", _class="sly sly-inspector")[
-        STYLE[
-            load_resource("stylesheet.css")
-        ],
+        X.stylesheet(),
         NAV[
             A(_class="browser-button", href=url(id, "browser", "previous"))["←"],
             A(_class="browser-button", href=url(id, "browser", "next"))["→"],
@@ -161,10 +165,89 @@ def design(id, inspection):
             A(id="browser-input", href=url(id, "browser", "input"))[escape(inspection.title)]
         ], BR,
         DIV[
-            structure_content(id, inspection.content)
+            A(_class="sly-inspector-page", href=url(id, "page", "previous"))[
+                f"↑ Show previous parts ({start} hidden)"
+            ] if first_page > 0 else "",
+            structure_content(id, content),
+            A(_class="sly-inspector-page", href=url(id, "page", "more"))[
+                f"↓ Load more ({end} of {inspection.length} parts shown)"
+            ] if end < inspection.length else ""
         ]
     ]]
 
+class InspectionHistory:
+    """The inspections of an inspector in the order Slynk keeps them, with
+    their rendered HTML so that going back and forth shows them at once.
+
+    An entry is `[inspection, html, evaluations]`, or None once dropped:
+    entries farthest from the current one are dropped past `budget`
+    characters of HTML, and all after `clear`.  Entries rendered before
+    the last evaluation are not used either."""
+    def __init__(self, budget):
+        self.entries = []
+        self.position = -1
+        self.budget = budget
+        self.size = 0
+
+    def get(self, position, evaluations):
+        if 0 <= position < len(self.entries):
+            entry = self.entries[position]
+            if entry is not None and entry[2] == evaluations:
+                return entry
+        return None
+
+    def move(self, step):
+        """Moves to the neighbouring entry, which may be unknown yet."""
+        position = self.position + step
+        if position < 0:
+            self.entries.insert(0, None)
+            position = 0
+        elif position >= len(self.entries):
+            self.entries.append(None)
+        self.position = position
+
+    def push(self, inspection, html, evaluations):
+        """Records a new inspection, which replaces the forward history."""
+        for entry in self.entries[self.position + 1:]:
+            if entry is not None:
+                self.size -= len(entry[1])
+        del self.entries[self.position + 1:]
+        self.entries.append(None)
+        self.position += 1
+        self.replace(inspection, html, evaluations)
+
+    def replace(self, inspection, html, evaluations):
+        """Records the current inspection."""
+        if self.position < 0:
+            return self.push(inspection, html, evaluations)
+        previous = self.entries[self.position]
+        if previous is not None:
+            self.size -= len(previous[1])
+        self.entries[self.position] = [inspection, html, evaluations]
+        self.size += len(html)
+        self.trim()
+
+    def clear(self):
+        self.entries = [None] * len(self.entries)
+        self.size = 0
+
+    def trim(self):
+        while self.size > self.budget:
+            farthest = max((position for position, entry in enumerate(self.entries)
+                            if entry is not None and position != self.position),
+                           key=lambda position: abs(position - self.position),
+                           default=None)
+            if farthest is None:
+                break
+            self.size -= len(self.entries[farthest][1])
+            self.entries[farthest] = None
+
+
+def same_inspection(inspection, other):
+    return (inspection.title == other.title
+            and inspection.length == other.length
+            and inspection.content.items == other.content.items)
+
 def parse_inspector(id, target_inspector):
     if type(target_inspector) == Inspector:
         return target_inspector.id
@@ -183,6 +266,19 @@ class Inspector(ui.UIView):
             self.session.slynk, 
             sly.settings().get("inspector")["view_title_affixes"],
             "")
+        self.inspection = None
+        self.history = InspectionHistory(
+            sly.settings().get("inspector").get("history_budget", 4_000_000))
+        # Where the pages of the inspection start, followed by the end of
+        # the last one known: they are only known as far as fetched.
+        self.page_starts = []
+        # The pages shown, as indices in `page_starts`
+        self.first_page = self.last_page = 0
+
+    def reöpen(self, window):
+        # Closed inspectors are reused, the pages they had are not
+        self.slynk.forget_inspection_pages(self.id)
+        super().reöpen(window)
 
     # The main reason `self.html` is not a property is just in case
     # I want to incrementally edit the HTML DOM-style.
@@ -190,57 +286,98 @@ class Inspector(ui.UIView):
         self.session.nearest_inspector = self
         super().flip()
 
-    async def inspect(self, query, package=None):
-        self.html = design(
-            self.id,
-            await self.slynk.inspect(query, self.id, self.id, package))
+    def show(self, inspection, html=None, replace=False):
+        """Shows an inspection, from the parts it came with, and records it
+        in the history as a new one unless it `replace`s the current one."""
+        self.inspection = inspection
+        self.page_starts = [inspection.start, inspection.end]
+        self.first_page = self.last_page = 0
+        self.html = html or str(design(self.id, inspection))
         self.flip()
+        record = self.history.replace if replace else self.history.push
+        record(inspection, self.html, self.slynk.evaluations)
+
+    async def navigate(self, step, fetch):
+        """Goes `step` back or forth in the history.
+
+        A cached inspection is shown at once.  Slynk is told to move all
+        the same, to keep its history in step, and what it answers is
+        only shown if the inspection changed meanwhile."""
+        history = self.history
+        entry = history.get(history.position + step, self.slynk.evaluations)
+        if entry is None:
+            inspection = await fetch(self.id)
+            if inspection is not None:
+                history.move(step)
+                self.show(inspection, replace=True)
+            return
+        history.move(step)
+        position = history.position
+        cached, html, __ = entry
+        # Pages past the first are fetched for the inspection shown
+        self.slynk.paginate(cached, self.id)
+        self.show(cached, html, replace=True)
+        inspection = await fetch(self.id)
+        if (inspection is not None and history.position == position
+                and not same_inspection(inspection, cached)):
+            self.show(inspection, replace=True)
+
+    async def show_pages(self, first, last):
+        content = []
+        for index in range(first, last + 1):
+            end, page = await self.slynk.inspection_page(self.page_starts[index], self.id)
+            if index + 1 == len(self.page_starts):
+                self.page_starts.append(end)
+            content += page
+        self.first_page, self.last_page = first, last
+        self.html = design(self.id, self.inspection, content,
+                           self.page_starts[first], self.page_starts[last + 1], first)
+        self.flip()
+
+    async def load_more(self):
+        if self.page_starts[self.last_page + 1] >= self.inspection.length:
+            return
+        last = self.last_page + 1
+        shown = sly.settings().get("inspector").get("shown_pages", 4)
+        await self.show_pages(max(self.first_page, last - shown + 1), last)
+
+    async def show_previous(self):
+        if self.first_page == 0:
+            return
+        first = self.first_page - 1
+        shown = sly.settings().get("inspector").get("shown_pages", 4)
+        await self.show_pages(first, min(self.last_page, first + shown - 1))
+
+    async def inspect(self, query, package=None):
+        self.show(await self.slynk.inspect(query, self.id, self.id, package))
 
     async def call_action(self, index, target_inspector=None):
-        html = design(
+        inspection = await self.slynk.inspector_call_action(
+            index,
             self.id,
-            await self.slynk.inspector_call_action(
-                index, 
-                self.id,
-                (id := parse_inspector(self.id, target_inspector))))
-        if id == self.id:
-            self.html = html
-            self.flip()
-        else:
-            inspectors[id].html = html
-            inspectors[id].flip()
+            (id := parse_inspector(self.id, target_inspector)))
+        # Actions act on the object inspected, which is shown anew
+        (self if id == self.id else self.session.inspectors[id]).show(inspection, replace=True)
 
     async def inspect_part(self, index, target_inspector=None):
-        html = design(
+        inspection = await self.slynk.inspect_part(
+            index,
             self.id,
-            await self.slynk.inspect_part(
-                index, 
-                self.id,
-                (id := parse_inspector(self.id, target_inspector))))
-        if id == self.id:
-            self.html = html
-            self.flip()
-        else:
-            inspectors[id].html = html
-            inspectors[id].flip()
+            (id := parse_inspector(self.id, target_inspector)))
+        (self if id == self.id else self.session.inspectors[id]).show(inspection)
 
     async def previous(self):
-        self.html = design(self.id, await self.slynk.inspector_previous(self.id))
-        self.flip()
+        await self.navigate(-1, self.slynk.inspector_previous)
 
     async def next(self):
-        self.html = design(self.id, await self.slynk.inspector_next(self.id))
-        self.flip()
+        await self.navigate(1, self.slynk.inspector_next)
 
     async def reinspect(self):
-        self.html = design(self.id, await self.slynk.reinspect(self.id))
-        self.flip()
+        self.history.clear()
+        self.show(await self.slynk.reinspect(self.id), replace=True)
 
     async def toggle_verbose(self):
-        self.html = design(
-            self.id, 
-            await self.slynk.toggle_verbose_inspection(self.id))
-        self.flip()
+        self.show(await self.slynk.toggle_verbose_inspection(self.id), replace=True)
 
     async def on_url_press(self, mode, index, **rest):
         if mode == "browser":
@@ -258,6 +395,11 @@ class Inspector(ui.UIView):
                 await self.inspect(expression)
             else:
                 print(f"inspector.py: Unknown query {mode}, {index}, {rest}")
+        elif mode == "page":
+            if index == "more":
+                await self.load_more()
+            else:
+                await self.show_previous()
         elif mode == "value":
             await self.inspect_part(int(index))
         elif mode == "action":
@@ -278,8 +420,7 @@ class Inspector(ui.UIView):
             thread=thread,
             current_inspector=self.id,
             target_inspector=self.id)
-        self.html = design(self.id, data)
-        self.flip()
+        self.show(data)
       except Exception as e:
         print("InspectorInFrame", e)
 
@@ -289,8 +430,7 @@ class Inspector(ui.UIView):
             thread=thread,
             current_inspector=self.id,
             target_inspector=self.id)
-        self.html = design(self.id, data)
-        self.flip()
+        self.show(data)
       except Exception as e:
         print("InspectorOfFrame", e)
 
@@ -300,7 +440,6 @@ class Inspector(ui.UIView):
             *args,
             current_inspector=self.id,
             target_inspector=self.id)
-        self.html = design(self.id, data)
-        self.flip()
+        self.show(data)
       except Exception as e:
         print("InspectorOfFTrace", e)     
\ No newline at end of file
@@ -1,5 +1,5 @@
 from sublime import *
-import sublime_plugin, asyncio, uuid
+import sublime_plugin, asyncio, uuid, os, tempfile, time
 from html import escape
 from .sly import *
 from . import util
@@ -183,11 +183,8 @@ class SlyReferenceCommand(sublime_plugin.TextCommand):
 
         out = f"\n\nReferences for `{query}`:\n"
         all_references = []
-        for mode in modes:
-            try:
-                references = await session.slynk.xref(query, mode, "T", package)
-            except Exception as e:
-                continue
+        references_by_mode = await session.slynk.xrefs(query, modes, "T", package)
+        for mode, references in zip(modes, references_by_mode):
             if len(references) == 0: 
                 continue
             all_references += references
@@ -226,4 +223,43 @@ class SlyReferenceCommand(sublime_plugin.TextCommand):
     def open(self, url):
         window = self.view.window() or self.window
         point, path = url.split(" ", 1)
-        util.open_file_at(window, path, int(point))
\ No newline at end of file
+        util.open_file_at(window, path, int(point))
+
+class SlyRpcStatisticsCommand(sublime_plugin.WindowCommand):
+    def run(self, reset=False, **kwargs):
+        session = sessions.get_by_window(self.window)
+        if session is None: return
+        metrics = session.slynk.metrics
+        ui.send_result_to_panel(
+            window=self.window,
+            result=metrics.report(),
+            header="Slynk RPC statistics")
+        if reset:
+            metrics.reset()
+
+
+class SlyRecordTrafficCommand(sublime_plugin.WindowCommand):
+    """Starts or stops capturing the Slynk traffic, for the replay benchmarks."""
+    def run(self, **kwargs):
+        asyncio.run_coroutine_threadsafe(self.async_run(**kwargs), loop)
+
+    async def async_run(self, **kwargs):
+        session = sessions.get_by_window(self.window)
+        if session is None: return
+        slynk = session.slynk
+        if slynk.recorder is not None:
+            path = slynk.recorder.path
+            slynk.stop_recording()
+            self.window.status_message(f"Slynk traffic recorded in {path}")
+            return
+        default = os.path.join(tempfile.gettempdir(),
+                               time.strftime("slynk-%Y%m%d-%H%M%S.slyrec"))
+        path = await util.show_input_panel(loop, self.window, "Record Slynk traffic to", default)
+        if not path:
+            return
+        try:
+            slynk.start_recording(path)
+        except OSError as e:
+            self.window.status_message(f"Unable to record to {path}: {e}")
+            return
+        self.window.status_message(f"Recording Slynk traffic to {path}")
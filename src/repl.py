@@ -9,6 +9,7 @@ from .sly import *
 import logging
 import functools
 import concurrent.futures
+import zlib
 
 from SublimeREPL import sublimerepl
 from SublimeREPL.repls import repl
@@ -21,6 +22,34 @@ def prepare_backtrack_phantom(region, regions_index, value_index):
                    f"{prefix}{regions_index}{infix}{value_index}{postfix}",
                    LAYOUT_INLINE)
 
+# Characters of the transcript of a closed REPL compressed together, the
+# last chunk is what is shown at first when the REPL is reopened
+TRANSCRIPT_CHUNK_SIZE = 1 << 18
+HISTORY_MARKER = "[Earlier output, move the caret here to load it]\n"
+
+class Transcript:
+    """The text of a closed REPL view, compressed by chunks so that it can
+    be restored from the end, a chunk at a time."""
+    def __init__(self, view, start=0, earlier=None):
+        self.chunks = list(earlier.chunks) if earlier else []
+        self.sizes = list(earlier.sizes) if earlier else []
+        end = view.size()
+        for chunk_start in range(start, end, TRANSCRIPT_CHUNK_SIZE):
+            text = view.substr(Region(chunk_start, min(chunk_start + TRANSCRIPT_CHUNK_SIZE, end)))
+            self.chunks.append(zlib.compress(text.encode("utf-8"), 1))
+            self.sizes.append(len(text))
+
+    def __bool__(self):
+        return bool(self.chunks)
+
+    def __len__(self):
+        return sum(self.sizes)
+
+    def pop(self):
+        """The last chunk not restored yet."""
+        self.sizes.pop()
+        return zlib.decompress(self.chunks.pop()).decode("utf-8")
+
 class ReplWrapper(repl.Repl):
     def __init__(self, slynk_repl):
         super().__init__("utf-8", "lisp")
@@ -45,11 +74,21 @@ class EventBasedReplView(sublimerepl.ReplView):
             write_values=self.on_write_values,
             prompt=self.on_prompt,
             evaluation_aborted=self.on_evaluation_aborted,
-            server_side_repl_close=self.on_server_side_repl_close)
+            server_side_repl_close=self.on_server_side_repl_close,
+            output_backlogged=self.on_output_backlogged)
         self.session = session
         self.playing = False
-        self.play()
+        # `:write-string`s not yet written, see `flush_output`
+        self.pending_output = []
+        self.pending_size = 0
+        self.flush_handle = None
+        # `pause` comes from the UI thread, the output from the event loop's
+        self.output_lock = threading.RLock()
+        self.replaying = False
         self.value_phantom_groups = []
+        # The `Transcript` of what precedes `HISTORY_MARKER` once thawed
+        self.history = None
+        self.play()
         self.id = self.repl.slynk_repl.channel.id
 
         self.backtrack_phantom_set = PhantomSet(self._view, "backtracking")
@@ -62,11 +101,19 @@ class EventBasedReplView(sublimerepl.ReplView):
         self.preserved_data = {}
     def play(self):
         self.playing = True
-        self.repl.slynk_repl.play_events()
+        # What was received while paused is written in as few edits as possible
+        self.replaying = True
+        try:
+            self.repl.slynk_repl.play_events()
+        finally:
+            self.replaying = False
+        self.flush_output()
 
     def pause(self):
-        self.playing = False
-        self.repl.slynk_repl.pause_events()
+        with self.output_lock:
+            self.flush_output()
+            self.playing = False
+            self.repl.slynk_repl.pause_events()
 
     def update_view_loop(self):
         return True
@@ -93,10 +140,89 @@ class EventBasedReplView(sublimerepl.ReplView):
         return False
 
     def on_print(self, message, *args):
-        self.fresh_line()
-        self.write(self.prevent_double_newline(str(message)))
+        message = str(message)
+        with self.output_lock:
+            if not self.playing:
+                # Received while being paused, kept for the next `play`
+                self.repl.slynk_repl.queue_output(message)
+                return
+            self.pending_output.append(message)
+            self.pending_size += len(message)
+            if not self.replaying and self.pending_size >= settings().get("repl")["output_flush_size"]:
+                self.flush_output()
+            elif self.flush_handle is None:
+                self.flush_handle = loop.call_later(
+                    settings().get("repl")["output_flush_interval"], self.flush_output)
+
+    def flush_output(self):
+        """Writes the pending output in one go, each string on a fresh line
+        as if written by itself.  Anything else written to the view must
+        flush first, so that it comes after the output."""
+        with self.output_lock:
+            if self.flush_handle is not None:
+                self.flush_handle.cancel()
+                self.flush_handle = None
+            if not self.pending_output:
+                return
+            avoid_double_newline = settings().get("repl")["avoid_double_newline"]
+            final_character = self.get_final_character()
+            text = []
+            for message in self.pending_output:
+                if final_character != self.NEWLINE_SEQUENCE:
+                    text.append(self.NEWLINE_SEQUENCE)
+                if avoid_double_newline and message[:1] == self.NEWLINE_SEQUENCE:
+                    message = message[1:]
+                if message:
+                    text.append(message)
+                    final_character = message[-1]
+                else:
+                    final_character = self.NEWLINE_SEQUENCE
+            self.pending_output = []
+            self.pending_size = 0
+            self.write("".join(text))
+            self.trim_scrollback()
+
+    def trim_scrollback(self):
+        """Erases the oldest lines beyond the `scrollback_limit` characters."""
+        limit = settings().get("repl")["scrollback_limit"]
+        view = self._view
+        if not limit or view.size() <= limit:
+            return
+        end = view.find_by_class(view.size() - limit, True, CLASS_LINE_START)
+        if end <= 0 or end > self._output_end:
+            return
+        view.run_command("repl_erase_text", {"start": 0, "end": end})
+        # The history not loaded yet would precede erased text
+        self.history = None
+        self.shift_positions(-end, clamp=True)
+
+    def shift_positions(self, delta, clamp=False):
+        """Moves what is known by position by `delta` characters, as text
+        is added or removed at the start.  The phantoms of removed text
+        end up before the start, and are not shown any more; the prompt
+        is kept at 0 at least if `clamp`."""
+        self._output_end += delta
+        for phantoms in self.value_phantom_groups:
+            for phantom in phantoms:
+                position = phantom.region.a + delta
+                phantom.region = Region(position, position)
+        if (prompt_region := self._view.settings().get("prompt-region")):
+            self._view.settings().set(
+                "prompt-region",
+                [max(point + delta, 0) if clamp else point + delta for point in prompt_region])
+
+    def load_history(self):
+        """Puts back the last chunk of the history in place of `HISTORY_MARKER`."""
+        text = self.history.pop()
+        marker = HISTORY_MARKER if self.history else ""
+        self._view.run_command("repl_erase_text", {"start": 0, "end": len(HISTORY_MARKER)})
+        self._view.run_command("repl_insert_text", {"pos": 0, "text": marker + text})
+        self.shift_positions(len(marker) + len(text) - len(HISTORY_MARKER))
+        if not self.history:
+            self.history = None
 
     def on_write_values(self, values, *args):
+        self.flush_output()
         # If there is nothing, we don't want to add an empty value grop
         if len(values) < 1:
             return
@@ -121,6 +247,7 @@ class EventBasedReplView(sublimerepl.ReplView):
         else:
             prompt = prompt + left + str(error_level) + right + terminator
         # Write-prompt makes it glitch out for some reason idky
+        self.flush_output()
         self.fresh_line()
         start = self._view.size() - 1
         self.write(prompt)
@@ -128,7 +255,12 @@ class EventBasedReplView(sublimerepl.ReplView):
         self._view.settings().set("package", package)
         self._view.settings().set("prompt-region", [start, end])
 
+    def on_output_backlogged(self, *data):
+        self.session.window.status_message(
+            f"REPL {self.id} is closed and drops its output, reopen it to see more")
+
     def on_evaluation_aborted(self, *data):
+        self.flush_output()
         self.fresh_line()
         self.write("Evaluation aborted for " + " ".join(data))
 
@@ -140,6 +272,7 @@ class EventBasedReplView(sublimerepl.ReplView):
     def closed(self, *data):
         self._view.set_name("🏁" + self._view.name())
         super().update_view_loop()
+        self.flush_output()
         self.fresh_line()
         self.write("[🏁 Connexion terminated]")
         self._view.set_status("sly", "❌ " + self._view.get_status("sly"))
@@ -154,7 +287,8 @@ class EventBasedReplView(sublimerepl.ReplView):
             phantoms = self.value_phantom_groups[value_region_group_index]
         else:
             phantoms = list(itertools.chain.from_iterable(self.value_phantom_groups))
-        self.backtrack_phantom_set.update(phantoms)
+        # Those of the history not loaded yet are before the start
+        self.backtrack_phantom_set.update([phantom for phantom in phantoms if phantom.region.a >= 0])
 
     def hide_backtrack_phantoms(self):
         self.backtrack_phantom_set.update([])
@@ -257,6 +391,9 @@ class SlyReplListener(sublime_plugin.EventListener):
             view.erase_regions("backtracking")
 
     def on_selection_modified(self, view):
+        if ((repl_view := get_repl_view(view)) and repl_view.history
+                and len(view.sel()) and view.sel()[0].begin() < len(HISTORY_MARKER)):
+            repl_view.load_history()
         if view.settings().get("enable-test"):
             view.run_command("show_scope_name")
             view.add_regions("test", [util.find_containing_form(view) or Region(0,0)], "region.greenish")
@@ -266,9 +403,13 @@ class SlyReplListener(sublime_plugin.EventListener):
         if not (rv := get_repl_view(view)): 
             return
         rv.pause()
+        history, rv.history = rv.history, None
+        if history:
+            # Positions in the whole transcript
+            rv.shift_positions(len(history) - len(HISTORY_MARKER))
         rv.preserved_data = {
             "settings": list(view.settings().to_dict().items()),
-            "contents": view.substr(Region(0, view.size())),
+            "transcript": Transcript(view, len(HISTORY_MARKER) if history else 0, history),
             "name": view.name(),
             "scratch": view.is_scratch()
         }
@@ -312,11 +453,19 @@ def thaw_repl(view, repl_view):
         view.settings()[key] = value
     view.set_name(data["name"])
     view.set_scratch(data["scratch"])
+    repl_view._view = view
+    # Only the end is shown at first, the rest is loaded as the caret gets to it
+    transcript = data["transcript"]
+    hidden = len(transcript)
+    text = transcript.pop() if transcript else ""
+    hidden -= len(text)
+    marker = HISTORY_MARKER if transcript else ""
     view.run_command("repl_insert_text", 
         {"pos": 0,
-         "text": data["contents"]})
-    view.show_at_center(len(data["contents"])-1)
-    repl_view._view = view
+         "text": marker + text})
+    repl_view.shift_positions(len(marker) - hidden)
+    repl_view.history = transcript or None
+    view.show_at_center(view.size()-1)
     repl_view.play()
     repl_view.preserved_data = {}
     repl_view.backtrack_phantom_set = PhantomSet(view, "backtracking")
@@ -69,15 +69,17 @@ __author__ = 'Joshua D. Boyd, Takafumi Arakaki'
 __license__ = 'BSD License'
 __all__ = [
     # API functions:
-    'load', 'loads', 'dump', 'dumps', 'parse',
+    'load', 'loads', 'loads_bytes', 'dump', 'dumps', 'dump_bytes', 'parse',
+    'tokenize',
     # Utility functions:
     'car', 'cdr',
     # S-expression classes:
-    'Symbol', 'String', 'Quoted', 'Brackets', 'Parens',
+    'Symbol', 'String', 'Quoted', 'Brackets', 'Parens', 'Raw', 'LazyList',
 ]
 
+import copy
 import re
-from collections import namedtuple, Iterable, Mapping
+from collections import namedtuple, Iterable, Mapping, Sequence
 from itertools import chain
 from string import whitespace
 
@@ -141,6 +143,9 @@ def loads(string, **kwds):
     :type     line_comment: str
     :keyword  line_comment: Beginning of line comment.
                             Default is ``';'``.
+    :type           engine: ``'recursive'`` or ``'stack'``
+    :keyword        engine: Parser implementation, see :func:`parse`.
+                            Default is ``'recursive'``.
 
     >>> loads("(a b)")
     [Symbol('a'), Symbol('b')]
@@ -198,6 +203,24 @@ def loads(string, **kwds):
     return obj[0]
 
 
+def loads_bytes(buffer, **kwds):
+    """
+    Load object from an UTF-8 encoded S-expression held in `buffer`.
+
+    :arg  buffer: A `bytes`, `bytearray` or `memoryview` object.
+
+    The buffer is parsed in place and only string and symbol tokens are
+    decoded.  See :func:`loads` for valid keyword arguments.
+
+    >>> loads_bytes(b'(:return (:ok "\\xc3\\xa9t\\xc3\\xa9") 1)')
+    [Symbol(':return'), [Symbol(':ok'), 'été'], 1]
+    >>> loads_bytes(memoryview(b'000004(a)')[6:])
+    [Symbol('a')]
+
+    """
+    return loads(buffer, engine='bytes', **kwds)
+
+
 def dump(obj, filelike, **kwds):
     """
     Write `obj` as an S-expression into given stream `filelike`.
@@ -274,6 +297,73 @@ def dumps(obj, **kwds):
     return unicode(tosexp(obj, **kwds))
 
 
+def dump_bytes(obj, buffer=None, **kwds):
+    """
+    Append `obj` as an UTF-8 encoded S-expression to a `bytearray`.
+
+    :arg      obj: A Python object.
+    :arg   buffer: The `bytearray` to write into, a new one by default.
+
+    Returns the buffer.  Lists, strings, symbols, numbers and
+    :class:`Raw` are written directly, without the intermediate strings
+    of :func:`dumps` (and without consulting `tosexp` registrations for
+    them), `bytes` are taken as an already encoded S-expression; anything
+    else, or any keyword argument, goes through `tosexp`.
+
+    >>> print(dump_bytes(['a', Symbol('b c'), 1, Quoted([2.5])]).decode())
+    ("a" b\\ c 1 '(2.5))
+    >>> print(dump_bytes(['say "hi"', Raw('#p"x"')], bytearray(b'x ')).decode())
+    x ("say \\"hi\\"" #p"x")
+
+    """
+    if buffer is None:
+        buffer = bytearray()
+    if kwds:
+        buffer += tosexp(obj, **kwds).encode('utf-8')
+    else:
+        _write_bytes(obj, buffer)
+    return buffer
+
+
+def _write_bytes(obj, buffer):
+    kind = type(obj)
+    if kind is unicode or kind is String:
+        # Quotes and backslashes are ASCII, they never occur within the
+        # encoding of another character: escaping the bytes is safe and
+        # spares a copy of the string.
+        data = obj.encode('utf-8')
+        if b'\\' in data:
+            data = data.replace(b'\\', b'\\\\')
+        if b'"' in data:
+            data = data.replace(b'"', b'\\"')
+        buffer += b'"'
+        buffer += data
+        buffer += b'"'
+    elif kind is Symbol:
+        buffer += Symbol.quote(obj).encode('utf-8')
+    elif kind is Raw:
+        buffer += obj.encode('utf-8')
+    elif kind is bytes:
+        buffer += obj
+    elif kind is int or kind is float:
+        buffer += str(obj).encode('utf-8')
+    elif kind is list:
+        buffer += b'('
+        first = True
+        for item in obj:
+            if first:
+                first = False
+            else:
+                buffer += b' '
+            _write_bytes(item, buffer)
+        buffer += b')'
+    elif kind is Quoted:
+        buffer += b"'"
+        _write_bytes(obj.x, buffer)
+    else:
+        buffer += tosexp(obj).encode('utf-8')
+
+
 def car(obj):
     """
     Alias of ``obj[0]``.
@@ -440,6 +530,13 @@ class String(unicode):
     def __ne__(self, other):
         return not self == other
 
+    # No instance dict: parsed data holds a lot of these
+    __slots__ = ()
+
+    # Defining `__eq__` drops the inherited hash.  Equal objects still
+    # have equal `str` hashes, so it is kept to allow use as dict keys.
+    __hash__ = unicode.__hash__
+
     _lisp_quoted_specials = [  # from Pymacs
         ('\\', '\\\\'),    # must come first to avoid doubly quoting "\"
         ('"', '\\"'), #('\b', '\\b'), ('\f', '\\f'),
@@ -469,6 +566,8 @@ def _(obj, **kwds):
 
 class Symbol(String):
 
+    __slots__ = ()
+
     _lisp_quoted_specials = [
         ('\\', '\\\\'),    # must come first to avoid doubly quoting "\"
         ("'", r"\'"), ("`", r"\`"), ('"', r'\"'),
@@ -479,14 +578,69 @@ class Symbol(String):
 
     _lisp_quoted_to_raw = dict((q, r) for (r, q) in _lisp_quoted_specials)
 
+    # Most symbols need no quoting: one search spares the replace passes.
+    _lisp_needs_quoting = re.compile('[{0}]'.format(
+        re.escape(''.join(r for (r, q) in _lisp_quoted_specials)))).search
+
+    @classmethod
+    def quote(cls, string):
+        if not cls._lisp_needs_quoting(string):
+            # As `replace` would, return a plain string
+            return unicode.__str__(string)
+        return super(Symbol, cls).quote(string)
+
     def __str__(self):
         return self.quote(self)
 
+    # name -> Symbol.  Bounded, as symbols read from the wire may be
+    # unbounded too (gensyms...); past the limit they are no longer shared.
+    _interned = {}
+    _intern_limit = 1 << 16
+
+    @staticmethod
+    def intern(name):
+        """
+        The symbol named `name`, one object per name.
+
+        The parsers intern their symbols, so repeated ones (keywords,
+        operators...) share memory and compare on identity first.
+
+        >>> Symbol.intern(':ok') is Symbol.intern(':ok')
+        True
+        >>> loads('(:ok :ok)')[0] is loads(':ok')
+        True
+        """
+        try:
+            return Symbol._interned[name]
+        except KeyError:
+            symbol = Symbol(name)
+            if len(Symbol._interned) < Symbol._intern_limit:
+                Symbol._interned[unicode.__str__(name)] = symbol
+            return symbol
+
 @tosexp.register(Symbol)
 def _(obj, **kwds):
     return Symbol.quote(obj)
 
 
+class Raw(unicode):
+
+    """
+    Text already in S-expression syntax, written out as is.
+
+    >>> dumps([Symbol('quote'), Raw('(:position 1)')])
+    '(quote (:position 1))'
+    """
+
+    def __repr__(self):
+        return '{0}({1})'.format(self.__class__.__name__,
+                                 unicode.__repr__(self))
+
+@tosexp.register(Raw)
+def _(obj, **kwds):
+    return unicode(obj)
+
+
 class Quoted(namedtuple('Quoted', 'x')):
 
     def __repr__(self):
@@ -680,7 +834,7 @@ class Parser(object):
             try:
                 return float(token)
             except ValueError:
-                return Symbol(token)
+                return Symbol.intern(token)
 
     def parse_sexp(self, i):
         string = self.string
@@ -732,10 +886,379 @@ class Parser(object):
         return sexp
 
 
-def parse(string, **kwds):
+class StackParser(Parser):
+
+    """
+    Single-pass parser producing the same objects as :class:`Parser`.
+
+    The whole input is tokenized by one compiled master regexp and the
+    tree is built with an explicit stack, so that deeply nested forms
+    cannot exhaust the recursion limit.  Malformed input is handed to
+    :class:`Parser` so that the same exceptions are raised.
+    """
+
+    _tokenizers = {}
+    # Opening paren and bracket, closing paren and bracket, double quote,
+    # apostrophe and escape, in the type the tokenizer yields.
+    characters = ('(', '[', ')', ']', '"', "'", '\\')
+
+    @classmethod
+    def tokenizer_pattern(cls, line_comment):
+        # Tokens are opening and closing brackets, strings, atoms,
+        # apostrophes and line comments.  Whitespace is skipped by
+        # `findall`; an unterminated string or a trailing escape is
+        # returned as a lone '"' or '\\'.
+        specials = re.escape(
+            ''.join(BRACKETS) + ''.join(cls.closing_brackets) +
+            '"\'\\' + whitespace + line_comment)
+        return (
+            '[{brackets}]'
+            '|"[^"\\\\]*(?:\\\\.[^"\\\\]*)*"'
+            '|(?:{atom}|\\\\.){atom}*(?:\\\\.{atom}*)*'
+            "|'|{comment}[^\\n]*|[\"\\\\]".format(
+                brackets=re.escape(''.join(BRACKETS) +
+                                   ''.join(cls.closing_brackets)),
+                atom='[^{0}]'.format(specials),
+                comment=re.escape(line_comment)))
+
+    @classmethod
+    def tokenizer(cls, line_comment):
+        try:
+            return cls._tokenizers[line_comment]
+        except KeyError:
+            regexp = cls._tokenizers[line_comment] = re.compile(
+                cls.tokenizer_pattern(line_comment), re.DOTALL)
+            return regexp
+
+    def unquoter(cls):
+        # Both quoting tables only ever prefix the raw character with a
+        # backslash, so unquoting is a plain substitution.
+        return re.compile(r'\\([{0}])'.format(re.escape(
+            ''.join(raw for (raw, __) in cls._lisp_quoted_specials))))
+
+    unquote_str = unquoter(String)
+    unquote_atom = unquoter(Symbol)
+    del unquoter
+
+    @staticmethod
+    def decode(token):
+        return token
+
+    @staticmethod
+    def encode(string):
+        return string
+
+    def fallback(self):
+        return Parser.parse(self)
+
+    def parse(self):
+        (OPEN_PAREN, OPEN_BRACKET, CLOSE_PAREN, CLOSE_BRACKET,
+         DOUBLE_QUOTE, APOSTROPHE, ESCAPE) = self.characters
+        closer = {OPEN_PAREN: CLOSE_PAREN, OPEN_BRACKET: CLOSE_BRACKET}
+        atom = self.atom
+        decode = self.decode
+        string_to = self.string_to
+        line_comment = self.line_comment
+        unquote_str = self.unquote_str.sub
+        unquote_atom = self.unquote_atom.sub
+        # Atoms repeat a lot (keywords, NIL, small integers), so their
+        # conversions are memoized.  Mutable results (nil as `[]`) are not.
+        atoms = {}
+        stack = []
+        sexp = []
+        append = sexp.append
+        opener = None
+        quotes = 0
+
+        tokens = self.tokenizer(line_comment).findall(self.string)
+        line_comment = self.encode(line_comment)
+        for token in tokens:
+            c = token[:1]
+            if c == OPEN_PAREN or c == OPEN_BRACKET:
+                stack.append((sexp, opener, quotes))
+                sexp = []
+                append = sexp.append
+                opener = c
+                quotes = 0
+                continue
+            elif c == CLOSE_PAREN or c == CLOSE_BRACKET:
+                if quotes or opener is None or c != closer[opener]:
+                    return self.fallback()
+                value = sexp if opener == OPEN_PAREN else Brackets(sexp)
+                (sexp, opener, quotes) = stack.pop()
+                append = sexp.append
+            elif c == DOUBLE_QUOTE:
+                if len(token) == 1:
+                    return self.fallback()
+                token = decode(token[1:-1])
+                value = string_to(unquote_str(r'\1', token)
+                                  if '\\' in token else token)
+            elif c == APOSTROPHE:
+                quotes += 1
+                continue
+            elif c == line_comment:
+                continue
+            else:
+                try:
+                    value = atoms[token]
+                except KeyError:
+                    if c == ESCAPE and len(token) == 1:
+                        return self.fallback()
+                    key = token
+                    token = decode(token)
+                    value = atom(unquote_atom(r'\1', token)
+                                 if '\\' in token else token)
+                    if type(value) is not list:
+                        atoms[key] = value
+            while quotes:
+                quotes -= 1
+                value = Quoted(value)
+            append(value)
+
+        if quotes or opener is not None:
+            return self.fallback()
+        return sexp
+
+
+class BytesParser(StackParser):
+
+    """
+    :class:`StackParser` over UTF-8 encoded `bytes`, `bytearray` or
+    `memoryview` input.
+
+    The buffer is tokenized as is; only the string and atom tokens are
+    decoded, so no intermediate `str` of the whole input is built.
+    UTF-8 never encodes a non-ASCII character with ASCII bytes, hence
+    the delimiters can be searched for byte-wise.
+    """
+
+    _tokenizers = {}
+    characters = tuple(c.encode('utf-8') for c in StackParser.characters)
+
+    @classmethod
+    def tokenizer(cls, line_comment):
+        try:
+            return cls._tokenizers[line_comment]
+        except KeyError:
+            regexp = cls._tokenizers[line_comment] = re.compile(
+                cls.tokenizer_pattern(line_comment).encode('utf-8'),
+                re.DOTALL)
+            return regexp
+
+    @staticmethod
+    def decode(token):
+        return token.decode('utf-8')
+
+    @staticmethod
+    def encode(string):
+        return string.encode('utf-8')
+
+    def fallback(self):
+        self.string = bytes(self.string).decode('utf-8')
+        return Parser.parse(self)
+
+
+
+class LazyList(Sequence):
+
+    """
+    A list of an UTF-8 encoded S-expression, decoded as it is looked at.
+
+    The buffer is read up to the item asked for: nested lists are only
+    skipped over, by their brackets, and become `LazyList` in turn.  A
+    large reply then costs a scan of what precedes the parts used plus
+    their decoding.  `materialize` parses the whole list at once.
+
+    :arg buffer: A `bytes`, `bytearray` or `memoryview` object, which
+                 must not change while the list is in use.
+    :arg  start: Offset of the opening bracket.
+    :arg    end: Offset just after the closing one, if known.
+
+    Other keyword arguments are those of :func:`loads`.
+
+    >>> x = LazyList(b'(1 (2 "b") c)')
+    >>> x[0]
+    1
+    >>> x[1]
+    LazyList(b'(2 "b")')
+    >>> x[1][1], len(x), x[-1]
+    ('b', 3, Symbol('c'))
+    >>> x == [1, [2, 'b'], Symbol('c')]
+    True
+    >>> x.materialize()
+    [1, [2, 'b'], Symbol('c')]
+
+    """
+
+    __slots__ = ('buffer', 'start', 'end', 'parser', 'items', 'position')
+
+    _skippers = {}
+
+    def __init__(self, buffer, start=0, end=None, parser=None, **kwds):
+        if buffer[start:start + 1] not in (b'(', b'['):
+            raise ValueError("No list at offset {0}".format(start))
+        self.buffer = buffer
+        self.start = start
+        self.end = end
+        self.parser = BytesParser(buffer, **kwds) if parser is None else parser
+        self.items = []
+        # Where the next item is read from, None once all are read
+        self.position = start + 1
+
+    @classmethod
+    def skipper(cls, line_comment):
+        # Everything up to the next bracket that is not within a string,
+        # a comment or escaped.
+        try:
+            return cls._skippers[line_comment]
+        except KeyError:
+            other = '[^][()"\\\\{0}]*'.format(re.escape(line_comment))
+            regexp = cls._skippers[line_comment] = re.compile(
+                '{other}(?:(?:"[^"\\\\]*(?:\\\\.[^"\\\\]*)*"|\\\\.|{comment}[^\\n]*)'
+                '{other})*[][()]'.format(other=other,
+                                         comment=re.escape(line_comment))
+                .encode('utf-8'), re.DOTALL)
+            return regexp
+
+    def skip(self, start):
+        """The offset after the list opened at `start`."""
+        buffer = self.buffer
+        depth = 0
+        for match in self.skipper(self.parser.line_comment).finditer(buffer, start):
+            end = match.end()
+            if buffer[end - 1] in b'([':
+                depth += 1
+            else:
+                depth -= 1
+                if not depth:
+                    return end
+        raise ExpectClosingBracket(None, ')')
+
+    def read(self):
+        """Reads the next item, returns False past the last one."""
+        position = self.position
+        if position is None:
+            return False
+        buffer = self.buffer
+        parser = self.parser
+        (OPEN_PAREN, OPEN_BRACKET, CLOSE_PAREN, CLOSE_BRACKET,
+         DOUBLE_QUOTE, APOSTROPHE, ESCAPE) = parser.characters
+        search = parser.tokenizer(parser.line_comment).search
+        line_comment = parser.encode(parser.line_comment)
+        quotes = 0
+        while True:
+            match = search(buffer, position)
+            if not match:
+                raise ExpectClosingBracket(None, ')')
+            token = match.group()
+            position = match.end()
+            c = token[:1]
+            if c == OPEN_PAREN or c == OPEN_BRACKET:
+                position = self.skip(match.start())
+                value = LazyList(buffer, match.start(), position, parser)
+                if c == OPEN_BRACKET:
+                    value = Brackets(value)
+            elif c == CLOSE_PAREN or c == CLOSE_BRACKET:
+                if quotes:
+                    raise ExpectSExp(position)
+                self.position = None
+                self.end = position
+                return False
+            elif c == DOUBLE_QUOTE:
+                if len(token) == 1:
+                    raise ExpectClosingBracket(None, '"')
+                token = parser.decode(token[1:-1])
+                value = parser.string_to(parser.unquote_str.sub(r'\1', token)
+                                         if '\\' in token else token)
+            elif c == APOSTROPHE:
+                quotes += 1
+                continue
+            elif c == line_comment:
+                continue
+            else:
+                if c == ESCAPE and len(token) == 1:
+                    raise ExpectClosingBracket(None, ')')
+                token = parser.decode(token)
+                value = parser.atom(parser.unquote_atom.sub(r'\1', token)
+                                    if '\\' in token else token)
+            while quotes:
+                quotes -= 1
+                value = Quoted(value)
+            self.items.append(value)
+            self.position = position
+            return True
+
+    def __len__(self):
+        while self.read():
+            pass
+        return len(self.items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            (start, stop, step) = (index.start or 0, index.stop, index.step or 1)
+            if stop is None or min(start, stop, step) < 0:
+                # Relative to the end, hence all items are needed
+                return [self[i] for i in range(*index.indices(len(self)))]
+            while len(self.items) < stop and self.read():
+                pass
+            return self.items[index]
+        if index < 0:
+            index += len(self)
+        items = self.items
+        while len(items) <= index and self.read():
+            pass
+        if not 0 <= index < len(items):
+            raise IndexError('list index out of range')
+        return items[index]
+
+    def __iter__(self):
+        items = self.items
+        index = 0
+        while index < len(items) or self.read():
+            yield items[index]
+            index += 1
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, LazyList)):
+            return NotImplemented
+        return (len(self) == len(other) and
+                all(x == y for (x, y) in zip(self, other)))
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        if self.end is None:
+            return '{0}(...)'.format(self.__class__.__name__)
+        text = bytes(self.buffer[self.start:min(self.end, self.start + 80)])
+        return '{0}({1!r}{2})'.format(self.__class__.__name__, text,
+                                      '...' if self.end - self.start > 80 else '')
+
+    def materialize(self):
+        """The whole list, parsed as `loads_bytes` would."""
+        if self.end is None:
+            self.end = self.skip(self.start)
+        parser = copy.copy(self.parser)
+        parser.string = memoryview(self.buffer)[self.start:self.end]
+        return parser.parse()[0]
+
+
+PARSERS = {'recursive': Parser, 'stack': StackParser, 'bytes': BytesParser}
+
+
+def parse(string, engine='recursive', **kwds):
     """
     Parse s-expression.
 
+    :type     engine: ``'recursive'`` or ``'stack'``
+    :keyword  engine: Parser implementation to use.  ``'stack'`` is a
+                      single-pass tokenizer which is faster on large
+                      inputs and does not recurse.  Default is
+                      ``'recursive'``.
+
     >>> parse("(a b)")
     [[Symbol('a'), Symbol('b')]]
     >>> parse("a")
@@ -744,6 +1267,24 @@ def parse(string, **kwds):
     [[Symbol('a'), Quoted(Symbol('b'))]]
     >>> parse("(a '(b))")
     [[Symbol('a'), Quoted([Symbol('b')])]]
+    >>> parse("(a '(b))", engine='stack')
+    [[Symbol('a'), Quoted([Symbol('b')])]]
+
+    """
+    return PARSERS[engine](string, **kwds).parse()
+
+
+def tokenize(string, line_comment=';'):
+    """
+    Tokens of `string` with their offsets, as :class:`StackParser` sees them.
+
+    Yields ``(start, end, token)``; tokens are brackets, strings, atoms,
+    apostrophes and line comments.  Nothing is validated, so incomplete
+    input such as the text before a cursor can be scanned.
+
+    >>> list(tokenize('(a "b" ;c'))
+    [(0, 1, '('), (1, 2, 'a'), (3, 6, '"b"'), (7, 9, ';c')]
 
     """
-    return Parser(string, **kwds).parse()
\ No newline at end of file
+    for match in StackParser.tokenizer(line_comment).finditer(string):
+        yield match.start(), match.end(), match.group()
\ No newline at end of file
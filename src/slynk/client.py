@@ -6,6 +6,10 @@ except ImportError as e:
     print(f"ImportError encoutered, switching gears in client: {e}")
     from util import *
 
+# Directions of the chunks in a recording, see `recording.py`
+RECEIVED = b"<"
+SENT = b">"
+
 class SlynkClientProtocol(Dispatcher, asyncio.Protocol):
     _events_ = [
         "reception",
@@ -13,10 +17,18 @@ class SlynkClientProtocol(Dispatcher, asyncio.Protocol):
         "disconnect"
     ]
 
+    HEADER_LENGTH = 6
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # The frame straddling two chunks: its header while incomplete,
+        # then a buffer of the announced size being filled in place.
+        self.partial_header = bytearray()
         self.partial_message = None
+        self.partial_length = 0
         self.transport = None
+        # A `recording.Recorder` capturing the traffic, if any
+        self.recorder = None
 
     def connection_made(self, transport):
         self.transport = transport
@@ -26,43 +38,80 @@ class SlynkClientProtocol(Dispatcher, asyncio.Protocol):
         self.emit("disconnect", something)
 
     def complete_data(self, data):
+        """Feeds the start of `data` to the partial frame.
+
+        Returns how many bytes were consumed."""
+        consumed = 0
         if self.partial_message is None:
-            packet_size = int(data[0:6].decode("utf-8"), 16)
-            if len(data) - 6 < packet_size:
-                self.partial_message = data
-                return None
-            else:  # Data is already complete
-                return data
-        else:
-            self.partial_message += data
-            packet_size = int(self.partial_message[0:6].decode("utf-8"), 16)
-            if len(self.partial_message) - 6 < packet_size:
-                return None
-            else:  # Data is finally complete
-                data = self.partial_message
-                self.partial_message = None
-                return data
+            consumed = self.HEADER_LENGTH - len(self.partial_header)
+            self.partial_header += data[:consumed]
+            if len(self.partial_header) < self.HEADER_LENGTH:
+                return len(data)
+            self.partial_message = bytearray(int(self.partial_header, 16))
+            self.partial_header = bytearray()
+        message = self.partial_message
+        start = self.partial_length
+        end = min(len(message), start + len(data) - consumed)
+        message[start:end] = data[consumed:consumed + end - start]
+        consumed += end - start
+        self.partial_length = end
+        if end == len(message):
+            self.partial_message = None
+            self.partial_length = 0
+            # Nothing else refers to the buffer, so a view of it is safe
+            self.emit("reception", memoryview(message))
+        return consumed
 
     def data_received(self, data):
-        data = self.complete_data(data)
-        if data is None:
-            return
-        packet_size = int(data[0:6].decode("utf-8"), 16)
-        # print(data)
-        self.emit("reception", data[6:packet_size + 6])
+        # Frames lying entirely within `data` are emitted as views of it,
+        # which is fine as asyncio hands over immutable `bytes`.  Only the
+        # frame left over at the end is copied, once, into its own buffer.
+        if self.recorder is not None:
+            self.recorder.record(RECEIVED, data)
+        data = memoryview(data)
+        size = len(data)
+        cursor = 0
+        if self.partial_message is not None or self.partial_header:
+            cursor = self.complete_data(data)
+        header_length = self.HEADER_LENGTH
+        while size - cursor >= header_length:
+            start = cursor + header_length
+            end = start + int(bytes(data[cursor:start]), 16)
+            if end > size:
+                break
+            self.emit("reception", data[start:end])
+            cursor = end
+        if cursor < size:
+            self.complete_data(data[cursor:])
 
-        remainder = data[packet_size + 6:]
-        if len(remainder) > 5:  # sanity check
-            # print("Remainder: ")
-            # print(remainder)
-            self.data_received(remainder)
-        elif len(remainder) > 0:
-            print("Erroneous remainder of ")
-            print(remainder)
+    @classmethod
+    def new_frame(cls):
+        """A buffer to serialize a message into, after room for its header.
 
-    def write(self, message):
+        Such a buffer can be passed to `write` as is."""
+        return bytearray(cls.HEADER_LENGTH)
+
+    @classmethod
+    def frame(cls, message):
+        if isinstance(message, bytearray):
+            # Filled in after `new_frame`, the header is set in place
+            message[:cls.HEADER_LENGTH] = b"%06X" % (len(message) - cls.HEADER_LENGTH)
+            return message
         output = message.encode("utf-8")
-        length = str(hex(len(output)))[2:].zfill(6).upper()
-        buffer = length.encode("utf-8") + output
+        return b"%06X" % len(output) + output
+
+    def write(self, message):
+        buffer = self.frame(message)
+        self.transport.write(buffer)
+        if self.recorder is not None:
+            self.recorder.record(SENT, buffer)
+        # print(buffer)
+        return len(buffer)
+
+    def write_many(self, messages):
+        buffers = [self.frame(message) for message in messages]
+        buffer = b"".join(buffers)
         self.transport.write(buffer)
-        # print(buffer)
\ No newline at end of file
+        if self.recorder is not None:
+            self.recorder.record(SENT, buffer)
+        return [len(buffer) for buffer in buffers]
\ No newline at end of file
@@ -0,0 +1,106 @@
+from collections import OrderedDict
+from typing import *
+
+try:
+    from .structs import Completion
+except ImportError as e:
+    from structs import Completion
+
+# Slynk truncates flex completions to this many results, a truncated
+# answer can't be narrowed down locally as it may miss some matches.
+FLEX_COMPLETION_LIMIT = 300
+
+
+def flex_match(pattern, name):
+    """Matches the characters of `pattern` in order in `name`, ignoring case.
+
+    Returns the chunks matched, as `[index, substring]` like Slynk's
+    match locations, or None."""
+    pattern = pattern.casefold()
+    folded = name.casefold()
+    chunks = []
+    position = 0
+    for character in pattern:
+        position = folded.find(character, position)
+        if position < 0:
+            return None
+        if chunks and chunks[-1][0] + len(chunks[-1][1]) == position:
+            chunks[-1][1] += name[position]
+        else:
+            chunks.append([position, name[position]])
+        position += 1
+    return chunks
+
+
+def flex_score(chunks, name):
+    """Long chunks early in short names score best, within [0, 1]."""
+    if not chunks:
+        return 0.0
+    matched = sum(len(chunk) for __, chunk in chunks)
+    score = sum(len(chunk) ** 2 / (1 + index / 4) for index, chunk in chunks)
+    return score / (matched * len(name)) if name else 0.0
+
+
+def narrow(completions, pattern, flex=True):
+    """The completions of `pattern` among those of one of its prefixes."""
+    narrowed = []
+    for completion in completions:
+        if flex:
+            chunks = flex_match(pattern, completion.name)
+            if chunks is None:
+                continue
+            narrowed.append(Completion(completion.name,
+                                       flex_score(chunks, completion.name),
+                                       chunks,
+                                       completion.namespaces))
+        elif completion.name.casefold().startswith(pattern.casefold()):
+            narrowed.append(completion)
+    if flex:
+        narrowed.sort(key=lambda completion: -completion.probability)
+    return narrowed
+
+
+class CompletionCache:
+    """The recent completions of a Slynk connexion, per package.
+
+    A pattern extending a cached one is answered by narrowing the cached
+    completions down.  Anything that may define or remove symbols should
+    call `invalidate`, which bumps the generation so that answers to
+    requests sent before it are not cached."""
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.generation = 0
+        # (package, flex, pattern) -> (completions, complete)
+        self.entries: OrderedDict = OrderedDict()
+
+    def invalidate(self):
+        self.generation += 1
+        self.entries.clear()
+
+    def get(self, pattern, package, flex=True) -> Optional[List[Completion]]:
+        entries = self.entries
+        for length in range(len(pattern), 0, -1):
+            key = (package, flex, pattern[:length])
+            entry = entries.get(key)
+            if entry is None:
+                continue
+            entries.move_to_end(key)
+            completions, complete = entry
+            if length == len(pattern):
+                return completions
+            if not complete:
+                return None
+            completions = narrow(completions, pattern, flex)
+            self.put(pattern, package, flex, completions, self.generation, True)
+            return completions
+        return None
+
+    def put(self, pattern, package, flex, completions, generation, complete=None):
+        if generation != self.generation:
+            return
+        if complete is None:
+            complete = not flex or len(completions) < FLEX_COMPLETION_LIMIT
+        self.entries[(package, flex, pattern)] = (completions, complete)
+        self.entries.move_to_end((package, flex, pattern))
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
@@ -1,4 +1,6 @@
 import asyncio, threading, pathlib
+from array import array
+from bisect import bisect_left
 from typing import *
 
 try:
@@ -9,11 +11,176 @@ except ImportError as e:
     from util import *
     from structs import *
 
+# Frames whose locals and source location are fetched as soon as the
+# debugger is entered, and requests about them in flight at once
+DEBUG_PREFETCH_FRAMES = 16
+DEBUG_PREFETCH_CONCURRENCY = 4
+# Frames fetched at once when more of a backtrace is wanted
+BACKTRACE_PAGE_SIZE = 50
+# Frames Slynk sends with `:debug` (`*SLY-DB-INITIAL-FRAMES*`), fewer
+# means that the whole stack was sent
+BACKTRACE_INITIAL_FRAMES = 20
+
+class Backtrace(Sequence):
+    """The frames of a debugger level as far as fetched, from the first.
+    Those sent with `:debug` come first, `Debug.debug_more_frames` adds
+    more.  Frames become `StackFrame`s when looked at."""
+    def __init__(self, frames, complete=False):
+        self.frames = list(frames)
+        # Whether the last frame of the stack has been fetched
+        self.complete = complete
+        # Whether more frames are being fetched
+        self.fetching = False
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        frame = self.frames[index]
+        if not isinstance(frame, StackFrame):
+            frame = self.frames[index] = parse_stack_frame(frame)
+        return frame
+
+    def extend(self, frames, count):
+        """Adds `frames`, fetched `count` at most."""
+        self.frames += frames
+        self.complete = len(frames) < count
+
+class TraceStore:
+    """The traces fetched from the trace dialog, kept in parallel arrays:
+    `ids`, `parent_ids` (-1 for the roots), `depths` and `spec_ids` into
+    `specs`.  The arguments and return values are interned in `strings`
+    and stored as ranges of `terms`, the children as a linked list through
+    `first_children` and `next_siblings`.  No `Trace` is kept.
+
+    Traces come in the order of the calls, so the ids grow and the
+    descendants of a trace follow it."""
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.ids = array("q")
+        self.parent_ids = array("q")
+        self.depths = array("i")
+        self.spec_ids = array("i")
+        self.specs: List[Tuple[str, str]] = []
+        self.spec_positions: Dict[Tuple[str, str], int] = {}
+        # Arguments and return values of trace `i` are `terms[term_starts[i]:
+        # term_starts[i+1]]`, the first `argument_counts[i]` being arguments
+        self.terms = array("i")
+        self.term_starts = array("q", [0])
+        self.argument_counts = array("i")
+        self.strings: List[str] = []
+        self.string_positions: Dict[str, int] = {}
+        # Positions, -1 for none; `roots` are the first and last root
+        self.first_children = array("q")
+        self.next_siblings = array("q")
+        self.last_children = array("q")
+        self.roots = [-1, -1]
+        # Positions of the ids that came out of order
+        self.unordered: Dict[int, int] = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def intern(self, string):
+        string = str(string)
+        try:
+            return self.string_positions[string]
+        except KeyError:
+            position = self.string_positions[string] = len(self.strings)
+            self.strings.append(string)
+            return position
+
+    def extend(self, traces):
+        for trace in traces:
+            index = len(self.ids)
+            if index and trace.id <= self.ids[-1]:
+                self.unordered[trace.id] = index
+            parent_id = trace.parent_id if isinstance(trace.parent_id, int) else -1
+            parent = self.position(parent_id)
+            self.ids.append(trace.id)
+            self.parent_ids.append(parent_id)
+            self.depths.append(0 if parent is None else self.depths[parent] + 1)
+            try:
+                spec_id = self.spec_positions[trace.spec]
+            except KeyError:
+                spec_id = self.spec_positions[trace.spec] = len(self.specs)
+                self.specs.append(trace.spec)
+            self.spec_ids.append(spec_id)
+            self.terms.extend(self.intern(term) for term in trace.arguments)
+            self.terms.extend(self.intern(term) for term in trace.return_list)
+            self.term_starts.append(len(self.terms))
+            self.argument_counts.append(len(trace.arguments))
+            self.first_children.append(-1)
+            self.next_siblings.append(-1)
+            self.last_children.append(-1)
+            if parent is None:
+                if self.roots[1] < 0:
+                    self.roots[0] = index
+                else:
+                    self.next_siblings[self.roots[1]] = index
+                self.roots[1] = index
+            else:
+                if self.last_children[parent] < 0:
+                    self.first_children[parent] = index
+                else:
+                    self.next_siblings[self.last_children[parent]] = index
+                self.last_children[parent] = index
+
+    def position(self, id):
+        """The position of the trace `id`, if fetched."""
+        index = bisect_left(self.ids, id)
+        if index < len(self.ids) and self.ids[index] == id:
+            return index
+        return self.unordered.get(id)
+
+    def spec(self, index):
+        return self.specs[self.spec_ids[index]]
+
+    def arguments(self, index):
+        start = self.term_starts[index]
+        return [self.strings[term]
+                for term in self.terms[start:start + self.argument_counts[index]]]
+
+    def return_list(self, index):
+        start = self.term_starts[index] + self.argument_counts[index]
+        return [self.strings[term] for term in self.terms[start:self.term_starts[index + 1]]]
+
+    def parent(self, index):
+        """The position of the parent of the trace at `index`, if fetched."""
+        parent_id = self.parent_ids[index]
+        return None if parent_id < 0 else self.position(parent_id)
+
+    def ancestors(self, index):
+        """The positions of the ancestors of the trace at `index`, root first."""
+        ancestors = []
+        while (index := self.parent(index)) is not None:
+            ancestors.append(index)
+        return ancestors[::-1]
+
+    def children(self, index):
+        child = self.first_children[index]
+        while child >= 0:
+            yield child
+            child = self.next_siblings[child]
+
+    def has_children(self, index):
+        return self.first_children[index] >= 0
+
+    def subtree_end(self, index):
+        """The position following the last descendant of the trace at `index`."""
+        while index is not None:
+            if self.next_siblings[index] >= 0:
+                return self.next_siblings[index]
+            index = self.parent(index)
+        return len(self.ids)
+
 class Debug:
+    @handles(":debug")
     def debug_setup_handler(self, expression):
-        def is_restartable(frame):
-            return bool(frame[2][1]) if len(frame) >= 3 else False
-
         data = DebugEventData(
             expression[1],  # Thread
             expression[2],  # Level
@@ -21,151 +188,239 @@ class Debug:
             expression[3][1],  # Type
             [(str(restart[0]), str(restart[1])) for restart in expression[4]],
             # Stack frames
-            [StackFrame(int(frame[0]), str(frame[1]), is_restartable(frame)) for frame in expression[5]]
+            Backtrace(expression[5], len(expression[5]) < BACKTRACE_INITIAL_FRAMES)
         )
         self.emit("debug_setup", data)
+        frames = [frame.index for frame in data.stack_frames[:DEBUG_PREFETCH_FRAMES]]
+        # A deeper level makes the frames of the previous one less likely to be looked at
+        previous = self.debug_prefetches.get(data.thread)
+        if previous is not None:
+            previous.cancel()
+        self.debug_prefetches[data.thread] = asyncio.ensure_future(
+            self.debug_prefetch_frames(frames, data.thread, data.level))
 
+    @handles(":debug-activate")
     def debug_activate_handler(self, expression):
         self.emit("debug_activate", DebugEventData(
             expression[1],
             expression[2]
         ))
 
+    @handles(":debug-return")
     def debug_return_handler(self, expression):
+        thread, level = expression[1], expression[2]
+        self.debug_stop_prefetching(thread)
+        # The requests are left to finish, cancelling them would interrupt the thread
+        for key in [key for key in self.frame_cache if key[0] == thread and key[1] >= level]:
+            del self.frame_cache[key]
         self.emit("debug_return", DebugEventData(
             expression[1],
             expression[2]
         ))
 
+    def debug_stop_prefetching(self, thread):
+        """Stops prefetching frames for the debugger in `thread`, whose
+        requests would otherwise be queued ahead of the next command."""
+        prefetch = self.debug_prefetches.pop(thread, None)
+        if prefetch is not None:
+            prefetch.cancel()
+
+    async def debug_frame_rex(self, kind, command, frame, thread, level, *args,
+                              timeout=None, deadline=None, **kwargs):
+        """`rex` of `command` about `frame`, whose answer is shared with the
+        prefetching and kept until the debugger returns from `level`.
+        Without a `level` nothing is cached."""
+        if level is None:
+            return await self.rex(command, thread, *args, timeout=timeout, deadline=deadline, **kwargs)
+        key = (thread, level, frame, kind)
+        future = self.frame_cache.get(key)
+        if future is None or future.cancelled() or (future.done() and future.exception()):
+            future = self.frame_cache[key] = asyncio.ensure_future(
+                self.rex(command, thread, *args, **kwargs))
+        timeout = self.remaining_time(timeout, deadline, self.loop)
+        # Shielded, as other callers may be waiting for the same answer
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+
+    async def debug_prefetch_frames(self, frames, thread, level):
+        """Fetches the locals and source location of `frames` in the
+        background, `DEBUG_PREFETCH_CONCURRENCY` requests at a time."""
+        semaphore = asyncio.Semaphore(DEBUG_PREFETCH_CONCURRENCY)
+
+        async def prefetch(fetch, frame):
+            async with semaphore:
+                try:
+                    await fetch(frame, thread, level=level)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print("FramePrefetchFailure", frame, e)
+
+        await asyncio.gather(*(prefetch(fetch, frame) for frame in frames
+                               for fetch in (self.debug_frame_locals, self.debug_frame_source)))
+
     async def debug_invoke_restart(self, level, restart, thread, *args, **kwargs):
-        command = "SLYNK:INVOKE-NTH-RESTART-FOR-EMACS " + str(level) \
-                  + " " + str(restart)
+        self.debug_stop_prefetching(thread)
+        command = call("SLYNK:INVOKE-NTH-RESTART-FOR-EMACS", level, restart)
         result = await self.rex(command, thread, *args, **kwargs)
         return result
 
     async def debug_escape_all(self, thread, *args, **kwargs):
-        result = await self.rex("SLYNK:THROW-TO-TOPLEVEL", thread, *args, **kwargs)
+        self.debug_stop_prefetching(thread)
+        result = await self.rex(call("SLYNK:THROW-TO-TOPLEVEL"), thread, *args, **kwargs)
         return result
 
     async def debug_continue(self, thread, *args, **kwargs):
-        result = await self.rex("SLYNK:SLY-DB-CONTINUE", thread, *args, **kwargs)
+        self.debug_stop_prefetching(thread)
+        result = await self.rex(call("SLYNK:SLY-DB-CONTINUE"), thread, *args, **kwargs)
         return result
 
     async def debug_abort_current_level(self, level, thread, *args, **kwargs):
+        self.debug_stop_prefetching(thread)
         if level == 1:
             result = await self.debug_escape_all(thread, *args, **kwargs)
         else:
-            result = await self.rex("SLYNK:SLY-DB-ABORT", thread, *args, **kwargs)
+            result = await self.rex(call("SLYNK:SLY-DB-ABORT"), thread, *args, **kwargs)
         return result
 
-    async def debug_get_stack_trace(self, thread, *args, **kwargs):
-        frames = await self.rex("SLYNK:BACKTRACE 0 NIL", thread, *args, **kwargs)
-        return [StackFrame(
-            int(frame[0]),
-            str(frame[1]),
-            True if len(frame) >= 3 and bool(frame[2][1]) else False
-        ) for frame in frames]
-
-    async def debug_stack_frame_details(self, index, stack_frames, *args, **kwargs):
-        frame = [frame for frame in stack_frames if frame.index == index][0]
-        if frame.locals is not None:
-            return frame
-        else:
-            response = await self.rex(f"SLYNK:FRAME-LOCALS-AND-CATCH-TAGS {str(index)}", *args, **kwargs)
-            frame.locals = [StackFrameLocal(
-                str(local[1]),
-                int(local[3]),
-                str(local[5])
-            ) for local in response[0]]
+    async def debug_backtrace(self, start, end, thread, *args, **kwargs):
+        """The raw frames from `start` to `end`, or to the bottom of the
+        stack if `end` is None."""
+        return await self.rex(call("SLYNK:BACKTRACE", start, symbol("NIL") if end is None else end),
+                              thread, *args, lazy=True, **kwargs)
+
+    async def debug_get_stack_trace(self, thread, *args, start=0, end=None, **kwargs):
+        frames = await self.debug_backtrace(start, end, thread, *args, **kwargs)
+        return LazySequence(frames, parse_stack_frame)
+
+    async def debug_more_frames(self, backtrace, thread, *args, count=BACKTRACE_PAGE_SIZE, **kwargs):
+        """Fetches the `count` frames following those of `backtrace` into it,
+        and returns them.  Nothing is fetched while a fetch is under way."""
+        if backtrace.complete or backtrace.fetching:
+            return []
+        backtrace.fetching = True
+        try:
+            start = len(backtrace)
+            backtrace.extend(await self.debug_backtrace(start, start + count, thread, *args, **kwargs),
+                             count)
+        finally:
+            backtrace.fetching = False
+        return backtrace[start:]
+
+    async def debug_stack_frame_details(self, index, stack_frames, thread, *args, level=None, **kwargs):
+        frame = stack_frames[index]
+        if frame.locals is None:
+            frame.locals, frame.catch_tags = await self.debug_frame_locals(
+                index, thread, *args, level=level, **kwargs)
+        return frame
 
-            frame.catch_tags = [str(tag) for tag in response[1]]
-            return frame
+    async def debug_frame_locals(self, frame, thread, *args, level=None, **kwargs):
+        response = await self.debug_frame_rex(
+            "locals", call("SLYNK:FRAME-LOCALS-AND-CATCH-TAGS", frame), frame, thread, level,
+            *args, **kwargs)
+        locals = [StackFrameLocal(
+            str(local[1]),
+            int(local[3]),
+            str(local[5])
+        ) for local in response[0]]
+        return locals, [str(tag) for tag in response[1]]
 
     async def debug_restart_frame(self, frame, *args, **kwargs):
-        response = await self.rex(f"SLYNK:RESTART-FRAME {frame}", *args, **kwargs)
+        if args:
+            self.debug_stop_prefetching(args[0])
+        response = await self.rex(call("SLYNK:RESTART-FRAME", frame), *args, **kwargs)
         return response
 
     async def debug_return_from_frame(self, frame, value, *args, **kwargs):
-        was_error = await self.rex(f"SLYNK:SLY-DB-RETURN-FROM-FRAME {frame} {dumps(value)}", *args, **kwargs)
+        if args:
+            self.debug_stop_prefetching(args[0])
+        was_error = await self.rex(call("SLYNK:SLY-DB-RETURN-FROM-FRAME", frame, value), *args, **kwargs)
         if bool(was_error):
             raise Exception("Lisp error while returning from frame: " + str(was_error))
 
-    async def debug_frame_source(self, frame, thread, *args, **kwargs):
-        result = await self.rex(f"SLYNK:FRAME-SOURCE-LOCATION {frame}", thread, *args, **kwargs)
+    async def debug_frame_source(self, frame, thread, *args, level=None, **kwargs):
+        result = await self.debug_frame_rex(
+            "source", call("SLYNK:FRAME-SOURCE-LOCATION", frame), frame, thread, level,
+            *args, **kwargs)
         return parse_location(result)
 
-    async def debug_disassemble_frame(self, frame, *args, **kwargs):
-        result = await self.rex(f"SLYNK:SLY-DB-DISASSEMBLE {frame}", *args, **kwargs)
+    async def debug_disassemble_frame(self, frame, thread, *args, level=None, **kwargs):
+        result = await self.debug_frame_rex(
+            "disassembly", call("SLYNK:SLY-DB-DISASSEMBLE", frame), frame, thread, level,
+            *args, **kwargs)
         return str(result)
 
     async def debug_eval_in_frame(self, frame, expression, *args, **kwargs):
-        interpackage = await self.rex(f"SLYNK:FRAME-PACKAGE-NAME {frame}", *args, **kwargs)
-        command = f'SLYNK:EVAL-STRING-IN-FRAME {dumps(expression)} {frame} "{str(interpackage)}"'
+        interpackage = await self.rex(call("SLYNK:FRAME-PACKAGE-NAME", frame), *args, **kwargs)
+        command = call("SLYNK:EVAL-STRING-IN-FRAME", expression, frame, str(interpackage))
         result = await self.rex(command, *args, **kwargs)
         return str(result)
 
     async def debug_step(self, frame, *args, **kwargs):
-        result = await self.rex(f"SLYNK:SLY-DB-STEP {frame}", *args, **kwargs)
+        result = await self.rex(call("SLYNK:SLY-DB-STEP", frame), *args, **kwargs)
         return result
 
     async def debug_next(self, frame, *args, **kwargs):
-        result = await self.rex(f"SLYNK:SLY-DB-NEXT {frame}", *args, **kwargs)
+        result = await self.rex(call("SLYNK:SLY-DB-NEXT", frame), *args, **kwargs)
         return result
 
     async def debug_out(self, frame, *args, **kwargs):
-        result = await self.rex(f"SLYNK:SLY-DB-OUT {frame}", *args, **kwargs)
+        result = await self.rex(call("SLYNK:SLY-DB-OUT", frame), *args, **kwargs)
         return result
 
     async def debug_break_on_return(self, frame, *args, **kwargs):
-        result = await self.rex(f"SLYNK:SLY-DB-BREAK-ON-RETURN {frame}", *args, **kwargs)
+        result = await self.rex(call("SLYNK:SLY-DB-BREAK-ON-RETURN", frame), *args, **kwargs)
         return result
 
     async def debug_break(self, function_name, *args, **kwargs):
-        result = await self.rex(f"SLYNK:SLY-DB-BREAK {dumps(function_name)}", *args, **kwargs)
+        result = await self.rex(call("SLYNK:SLY-DB-BREAK", function_name), *args, **kwargs)
         return result
 
 # For the trace dialog:
 
     async def tracer_toggle(self, function_name, *args, **kwargs) -> str:
         result = await self.rex(
-            f"slynk-trace-dialog:dialog-toggle-trace (slynk::from-string {dumps(function_name)})",
+            call("slynk-trace-dialog:dialog-toggle-trace", call("slynk::from-string", function_name)),
             *args, **kwargs)
         return result
 
     async def tracer_trace(self, function_name, *args, **kwargs) -> str:
         result = await self.rex(
-            f"slynk-trace-dialog:dialog-trace (slynk::from-string {dumps(function_name)})",
+            call("slynk-trace-dialog:dialog-trace", call("slynk::from-string", function_name)),
             *args, **kwargs)
         return result
 
     async def tracer_untrace(self, function_name, *args, **kwargs):
         result = await self.rex(
-            f"slynk-trace-dialog:dialog-untrace '{function_name}",
+            call("slynk-trace-dialog:dialog-untrace", quote(Raw(function_name))),
             *args, **kwargs)
         return result
 
     async def tracer_untrace_all(self, *args, **kwargs) -> Tuple[str, str]:
-        result = await self.rex("slynk-trace-dialog:dialog-untrace-all", *args, **kwargs)
+        result = await self.rex(call("slynk-trace-dialog:dialog-untrace-all"), *args, **kwargs)
         return [(spec[0], str(spec[2])) for spec in result]
 
     async def tracer_report_specs(self, *args, **kwargs) -> Tuple[str, str]:
-        result = await self.rex("slynk-trace-dialog:report-specs", *args, **kwargs)
+        result = await self.rex(call("slynk-trace-dialog:report-specs"), *args, **kwargs)
         return [(spec[0], str(spec[2])) for spec in result]
 
     async def tracer_report_total(self, *args, **kwargs) -> int:
-        result = await self.rex("slynk-trace-dialog:report-total", *args, **kwargs)
+        result = await self.rex(call("slynk-trace-dialog:report-total"), *args, **kwargs)
         return result       
 
     async def tracer_clear(self, *args, **kwargs):
-        result = await self.rex("slynk-trace-dialog:clear-trace-tree", *args, **kwargs)
+        result = await self.rex(call("slynk-trace-dialog:clear-trace-tree"), *args, **kwargs)
         return result       
 
-    async def tracer_report_partial_tree(self, key, *args, **kwargs) -> Tuple[List[Trace], int, str]:
-        results = await self.rex(f"slynk-trace-dialog:report-partial-tree '{key}", *args, **kwargs)
-        traces = [Trace(result[0], result[1],
-                        (result[2][0], str(result[2][2])),
-                        [argument[1] for argument in result[3]],
-                        [returnee[1] for returnee in result[4]],
-                        *result[5:])
-                   for result in results[0]]
-        return (traces, results[1], str(results[2]))
+    async def tracer_report_partial_tree(self, key, *args, **kwargs) -> Tuple[Sequence[Trace], int, str]:
+        results = await self.rex(call("slynk-trace-dialog:report-partial-tree", quote(Raw(key))), *args, lazy=True, **kwargs)
+        return (LazySequence(results[0], parse_trace), results[1], str(results[2]))
+
+    async def tracer_stream_tree(self, key, *args, **kwargs) -> AsyncIterator[Tuple[Sequence[Trace], int]]:
+        """The traces not yet reported to `key`, batch after batch, each with
+        the number of traces remaining after it.  Stop iterating to stop fetching."""
+        remainder = None
+        while remainder != 0:
+            traces, remainder, __ = await self.tracer_report_partial_tree(key, *args, **kwargs)
+            if not traces:
+                return
+            yield traces, remainder
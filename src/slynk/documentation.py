@@ -1,4 +1,4 @@
-import asyncio, threading, pathlib
+import asyncio, threading, pathlib, re
 
 try:
     from .util import *
@@ -8,59 +8,148 @@ except ImportError as e:
     from util import *
     from structs import *
 
+CURSOR_MARKER = Symbol("SLYNK::%CURSOR-MARKER%")
+AUTODOC_CACHE_SIZE = 256
+# The token ending at the cursor, if any
+_TOKEN_AT_CURSOR = re.compile(r"""[^\s()\[\]'`,"]+$""")
+_NUMBER = re.compile(r"[-+]?(\d+\.?\d*|\.\d+)([eEdDfFsSlL][-+]?\d+)?(/\d+)?$")
+
+def at_variable(expression_string, cursor_position):
+    """Whether the cursor is on a symbol that may have a value, which
+    Slynk's autodoc then shows instead of an arglist."""
+    token = _TOKEN_AT_CURSOR.search(expression_string, 0, cursor_position)
+    return bool(token) and not token.group().startswith(("#", ":")) and not _NUMBER.match(token.group())
+
+def autodoc_context(expression_string, cursor_position):
+    """The forms around the cursor the way Slynk's autodoc wants them.
+
+    Every element before the cursor is kept as its source text and the
+    innermost form ends with the cursor marker.  Also returns the
+    operator and the position of the cursor in each of these forms,
+    outermost first, which is all the answer depends on.  Both are None
+    when the cursor is outside of any form."""
+    stack = []
+    elements = []
+    quote_start = None
+    for start, end, token in tokenize(expression_string):
+        if start >= cursor_position:
+            break
+        first = token[:1]
+        if first == "(" or first == "[":
+            stack.append((elements, start if quote_start is None else quote_start))
+            elements = []
+        elif first == ")" or first == "]":
+            if not stack:
+                continue
+            parent, form_start = stack.pop()
+            parent.append(expression_string[form_start:end])
+            elements = parent
+        elif first == "'":
+            if quote_start is None:
+                quote_start = start
+            continue
+        elif first != ";":
+            elements.append(expression_string[start if quote_start is None else quote_start:end])
+        quote_start = None
+    if not stack:
+        return None, None
+
+    def operator(elements):
+        return elements[0].upper() if elements else ""
+
+    form = elements + [CURSOR_MARKER]
+    path = [(operator(elements), len(elements))]
+    for parent, __ in reversed(stack[1:]):
+        form = parent + [form]
+        path.append((operator(parent), len(parent)))
+    return form, tuple(reversed(path))
+
+
 class Documentation:
-    async def autodoc(self, expression_string, cursor_position, *args, **kwargs):
-        expression = loads(expression_string)
-        cursor_marker = Symbol("SLYNK::%CURSOR-MARKER%")
+    async def autodoc(self, expression_string, cursor_position, thread="T", package=DEFAULT_PACKAGE):
         try:
-            output_forms = []
-            is_cursor_placed = False
-            previous_length = 0
-            for form in expression:
-                output_forms.append(str(form))
-                new_length = previous_length + len(dumps(form))
-                is_cursor_within_form = previous_length <= cursor_position <= new_length
-                if is_cursor_within_form and not is_cursor_placed:
-                    break
-                previous_length = new_length
-            # We're doing the weird thing below, because at the time
-            # sexpdata was doing this weird thing where 
-            # `dumps(Symbol("SLYNK::%CURSOR-MARKER%"))` => `'"SLYNK::%CURSOR-MARKER"'`
-            command = f"SLYNK:AUTODOC '{dumps(output_forms)[:-1]} SLYNK::%CURSOR-MARKER%) :PRINT-RIGHT-MARGIN 80"
+            form, path = autodoc_context(expression_string, cursor_position)
         except Exception as e:
             print("Error constructing command for autodoc")
             print(e)
             return Symbol(":NOT-AVAILABLE")
-        else:
-            response = await self.rex(command, *args, **kwargs)
-            return response[0] if len(response) > 1 else Symbol(":NOT-AVAILABLE")
+        if form is None:
+            return Symbol(":NOT-AVAILABLE")
+        # What is shown for a variable depends on its value
+        key = None if at_variable(expression_string, cursor_position) else (package, path)
+        cache = self.autodoc_cache
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        generation = self.completion_cache.generation
+        response = await self.rex(
+            call("SLYNK:AUTODOC", quote(form), keyword("PRINT-RIGHT-MARGIN"), 80),
+            thread, package)
+        result = response[0] if len(response) > 1 else Symbol(":NOT-AVAILABLE")
+        # Slynk tells whether the answer only depends on the operator
+        if (key is not None and len(response) > 1 and response[1]
+                and generation == self.completion_cache.generation):
+            cache[key] = result
+            if len(cache) > AUTODOC_CACHE_SIZE:
+                cache.popitem(last=False)
+        return result
+
+    async def autodoc_soon(self, expression_string, cursor_position, thread="T", package=DEFAULT_PACKAGE, delay=0.1):
+        """`autodoc` once the cursor has stayed `delay` seconds in place.
+
+        A later call supersedes this one, which then returns None, and
+        cancels its request if it was already sent."""
+        if self.autodoc_task is not None:
+            self.autodoc_task.cancel()
+
+        async def debounced():
+            await asyncio.sleep(delay)
+            return await self.autodoc(expression_string, cursor_position, thread, package)
+
+        task = self.autodoc_task = asyncio.ensure_future(debounced())
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if task is self.autodoc_task:
+                raise
+            return None
+        finally:
+            if task is self.autodoc_task:
+                self.autodoc_task = None
 
     # defslyfuns
     async def describe(self, expression_string: str,  mode="symbol", *args, **kwargs):
-        result = await self.rex(f"SLYNK:DESCRIBE-{mode.upper()} {dumps(expression_string)}", *args, **kwargs)
+        result = await self.rex(call(f"SLYNK:DESCRIBE-{mode.upper()}", expression_string), *args, **kwargs)
         return result
         
     # A defslyfun
     async def documentation_symbol(self, symbol_name, *args, **kwargs):
-        documentation = await self.rex(f'SLYNK:DOCUMENTATION-SYMBOL "{symbol_name}"', *args, **kwargs)
+        documentation = await self.rex(call("SLYNK:DOCUMENTATION-SYMBOL", symbol_name), *args, **kwargs)
         return documentation
 
     # A defslyfun
     async def apropos(self, pattern, external_only=True, case_sensitive=False, *args, **kwargs):
-        command = f"slynk-apropos:apropos-list-for-emacs {dumps(pattern)} {dumps(external_only)} {dumps(case_sensitive)}"
+        command = call("slynk-apropos:apropos-list-for-emacs", pattern, external_only, case_sensitive)
         propos_list = await self.rex(command, "T", *args, **kwargs)
         x = [property_list_to_dict(plist) for plist in propos_list]
         return x
 
     async def completions(self, pattern, package=DEFAULT_PACKAGE, flex=True):
-        pattern = dumps(pattern)
-        command = f"SLYNK-COMPLETION:{'FLEX' if flex else 'SIMPLE'}-COMPLETIONS (QUOTE {pattern}) \"{package}\""
+        cache = self.completion_cache
+        completions = cache.get(pattern, package, flex)
+        if completions is not None:
+            return completions
+        generation = cache.generation
+        command = call(f"SLYNK-COMPLETION:{'FLEX' if flex else 'SIMPLE'}-COMPLETIONS",
+                       quote(pattern), str(package))
         response = await self.rex(command, "T", package)
-        return [Completion(*completion[:-1], completion[3].split(","))
-                for completion in response[0]]
+        completions = [Completion(*completion[:-1], completion[3].split(","))
+                       for completion in response[0]]
+        cache.put(pattern, package, flex, completions, generation)
+        return completions
 
     async def find_definitions(self, function_name, *args, **kwargs):
-        raw_definitions = await self.rex(f"SLYNK:FIND-DEFINITIONS-FOR-EMACS {dumps(function_name)}", "T", *args, **kwargs)
+        raw_definitions = await self.rex(call("SLYNK:FIND-DEFINITIONS-FOR-EMACS", function_name), "T", *args, **kwargs)
         definitions = []
         for raw_definition in raw_definitions:
             try:
@@ -91,7 +180,7 @@ class Documentation:
         elif not recursively:
             function_name += "-1"
 
-        result = await self.rex(f"SLYNK:SLYNK-{function_name} {dumps(form)}", "T", package)
+        result = await self.rex(call(f"SLYNK:SLYNK-{function_name}", form), "T", package)
         if name:
             return result, function_name
         return result
\ No newline at end of file
@@ -1,5 +1,6 @@
 import asyncio, threading, pathlib
-from sys import maxsize
+from collections import OrderedDict
+from typing import *
 
 try:
     from .util import *
@@ -9,6 +10,32 @@ except ImportError as e:
     from util import *
     from structs import *
 
+# Parts of an inspection fetched at once, and pages kept per inspector
+INSPECTOR_PAGE_SIZE = 500
+INSPECTOR_MAX_PAGES = 8
+
+class InspectionPages:
+    """The content of an inspection by pages of parts, a page being
+    `(end, content)` keyed by its first part.  Only the `max_pages` most
+    recently used are kept, the others are fetched again if needed."""
+    def __init__(self, length, page_size=INSPECTOR_PAGE_SIZE, max_pages=INSPECTOR_MAX_PAGES):
+        self.length = length
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.pages: OrderedDict = OrderedDict()
+
+    def get(self, start):
+        page = self.pages.get(start)
+        if page is not None:
+            self.pages.move_to_end(start)
+        return page
+
+    def put(self, start, end, content):
+        self.pages[start] = (end, content)
+        self.pages.move_to_end(start)
+        while len(self.pages) > self.max_pages:
+            self.pages.popitem(last=False)
+
 class Inspector:
     # not to be confused with `parse_inspection` in util.py
     async def parse_inspection(self, result, *args, **kwargs):
@@ -26,20 +53,52 @@ class Inspector:
                 print(f"Unknown key {key} found in presentation results")
 
         [content_description, content_length, content_start, content_end] = raw_content
+        # The parts past `content_end` are fetched by `inspection_page`
+        inspection.length = content_length
+        inspection.start = content_start
+        inspection.end = content_end
+        inspection.content = LazySequence(
+            content_description,
+            lambda element: element if type(element) == str else [element[0], element[1], element[2]])
 
-        if content_end < content_length:
-            result_1 = await self.rex(f"SLYNK:INSPECTOR-RANGE {str(content_length)} {maxsize}", "T", *args, **kwargs)
-            content_description_1 = result_1[0]
-            if int(result_1[3]) <= int(result_1[1]):
-                raise Exception("Continues to miss part of the inspection")
-            content_description += content_description_1
-
-        inspection.content = [
-            [element[0], element[1], element[2]] if type(element) != str else element
-            for element in content_description]
+        return inspection
 
+    def paginate(self, inspection, inspector=None):
+        """Starts the pages of `inspector` with its new `inspection`,
+        whose content is the first one."""
+        if inspection is not None:
+            pages = InspectionPages(inspection.length)
+            pages.put(inspection.start, inspection.end, inspection.content)
+            self.inspection_pages[inspector or self.current_inspector] = pages
         return inspection
 
+    async def inspection_page(self, start, inspector=None, **kwargs) -> Tuple[int, Sequence]:
+        """The page of the current inspection of `inspector` from part
+        `start`, as `(end, content)`.
+
+        A page starts where the previous one ends, the first one at the
+        start of the inspection.  Pages no longer cached are fetched from
+        Slynk, `page_size` parts at a time."""
+        inspector = inspector or self.current_inspector
+        pages = self.inspection_pages.get(inspector)
+        page = pages.get(start) if pages is not None else None
+        if page is None:
+            page_size = pages.page_size if pages is not None else INSPECTOR_PAGE_SIZE
+            [content, length, __, end] = await self.eval_for_inspector(
+                "SLYNK:INSPECTOR-RANGE", start, start + page_size,
+                current_inspector=inspector, target_inspector=inspector, **kwargs)
+            if pages is None:
+                pages = self.inspection_pages[inspector] = InspectionPages(length)
+            pages.length = length
+            page = (end, LazySequence(content, parse_inspection_element))
+            pages.put(start, *page)
+        return page
+
+    def forget_inspection_pages(self, inspector=None):
+        """Drops the pages kept for `inspector`, as when it is closed;
+        they are fetched again if it shows them later."""
+        self.inspection_pages.pop(inspector or self.current_inspector, None)
+
     # Careful, the format for commands here is as a list and not
     # a precomposed string
     async def eval_for_inspector(self, slyfun, *args, 
@@ -56,12 +115,13 @@ class Inspector:
         if not current_inspector:
             current_inspector = self.current_inspector
 
-        query = " ".join([
-            "SLYNK:EVAL-FOR-INSPECTOR",
-            dumps(current_inspector),
-            dumps(target_inspector),
-            f"'{slyfun}", 
-        ] + [dumps(element) for element in args])
+        query = call("SLYNK:EVAL-FOR-INSPECTOR",
+                     current_inspector,
+                     target_inspector,
+                     quote(symbol(slyfun)),
+                     *args)
+        # Large inspections are decoded as they are shown
+        kwargs.setdefault("lazy", True)
         result = await self.rex(query, thread, **kwargs)
         return result
 
@@ -71,83 +131,89 @@ class Inspector:
             target_inspector=target_inspector,
             current_inspector=current_inspector,
             package=package)
-        return parse_inspection(result)
+        return self.paginate(parse_inspection(result), target_inspector or current_inspector)
 
     async def inspect_part(self, part, current_inspector=None, target_inspector=None):
         result = await self.eval_for_inspector(
             "SLYNK:INSPECT-NTH-PART", part,
             target_inspector=target_inspector,
             current_inspector=current_inspector)
-        return parse_inspection(result)
+        return self.paginate(parse_inspection(result), target_inspector or current_inspector)
 
     async def inspector_call_action(self, action, current_inspector=None, target_inspector=None):
         result = await self.eval_for_inspector(
             "SLYNK::INSPECTOR-CALL-NTH-ACTION", action,
             target_inspector=target_inspector,
             current_inspector=current_inspector)
-        return parse_inspection(result)
+        return self.paginate(parse_inspection(result), target_inspector or current_inspector)
 
     async def inspector_previous(self, current_inspector=None, target_inspector=None):
         result = await self.eval_for_inspector(
             "SLYNK:INSPECTOR-POP",
             target_inspector=target_inspector,
             current_inspector=current_inspector)
-        return parse_inspection(result)
+        return self.paginate(parse_inspection(result), target_inspector or current_inspector)
 
     async def inspector_next(self, current_inspector=None, target_inspector=None):
         result = await self.eval_for_inspector(
             "SLYNK:INSPECTOR-NEXT",
             target_inspector=target_inspector,
             current_inspector=current_inspector)
-        return parse_inspection(result)
+        return self.paginate(parse_inspection(result), target_inspector or current_inspector)
 
     async def reinspect(self, current_inspector=None, target_inspector=None):
         result = await self.eval_for_inspector(
             "SLYNK:INSPECTOR-REINSPECT",
             target_inspector=target_inspector,
             current_inspector=current_inspector)
-        return parse_inspection(result)
+        return self.paginate(parse_inspection(result), target_inspector or current_inspector)
 
     async def toggle_verbose_inspection(self, current_inspector=None, target_inspector=None):
         result = await self.eval_for_inspector(
             "SLYNK:INSPECTOR-REINSPECT",
             target_inspector=target_inspector,
             current_inspector=current_inspector)
-        return parse_inspection(result)
+        return self.paginate(parse_inspection(result), target_inspector or current_inspector)
 
     async def inspect_presentation(self, presentation_id, should_reset=False, *args, **kwargs):
         should_reset = "T" if len(args) > 0 and args[0] else "NIL"
-        inspection_result = await self.rex(f"SLYNK:INSPECT-PRESENTATION {str(presentation_id)} {dumps(should_reset)}",
-                                           ":REPL-THREAD", *args, **kwargs)
+        inspection_result = await self.rex(call("SLYNK:INSPECT-PRESENTATION", presentation_id, should_reset),
+                                           ":REPL-THREAD", *args, lazy=True, **kwargs)
         result = await self.parse_inspection(inspection_result, *args, **kwargs)
-        return result
+        return self.paginate(result)
 
     async def inspect_frame_var(self, frame_index, variable, thread, *args, **kwargs):
-        inspection_result = await self.rex(f"SLYNK:INSPECT-FRAME-VAR {str(frame_index)} {str(variable)}", thread, *args, **kwargs)
+        inspection_result = await self.rex(call("SLYNK:INSPECT-FRAME-VAR", frame_index, variable), thread, *args, **kwargs)
         result = await parse_inspection(inspection_result, *args, **kwargs)
         return result
 
     async def inspect_in_frame(self, frame_index, expression_string, thread, target_inspector=None, current_inspector=None):
-        return parse_inspection(
+        return self.paginate(parse_inspection(
             await self.eval_for_inspector(
                 "SLYNK:INSPECT-IN-FRAME",
                 expression_string,
                 frame_index,
                 thread=thread,
                 target_inspector=target_inspector,
-                current_inspector=current_inspector))
+                current_inspector=current_inspector)),
+            target_inspector or current_inspector)
 
     async def inspect_current_condition(self, thread, target_inspector=None, current_inspector=None):
-        return parse_inspection(
+        return self.paginate(parse_inspection(
             await self.eval_for_inspector(
                 "SLYNK:INSPECT-CURRENT-CONDITION",
                 thread=thread,
                 target_inspector=target_inspector,
-                current_inspector=current_inspector))
+                current_inspector=current_inspector)),
+            target_inspector or current_inspector)
 
     async def inspect_trace(self, trace_id, element_id, is_input_value=True, target_inspector=None, current_inspector=None):
-        return parse_inspection(
+        return self.paginate(parse_inspection(
             await self.eval_for_inspector(
-                f"slynk-trace-dialog:inspect-trace-part {trace_id} {element_id} {':arg' if is_input_value else ':retval'}",
+                "slynk-trace-dialog:inspect-trace-part",
+                trace_id,
+                element_id,
+                keyword("arg" if is_input_value else "retval"),
                 target_inspector=target_inspector,
-                current_inspector=current_inspector))
\ No newline at end of file
+                current_inspector=current_inspector)),
+            target_inspector or current_inspector)
\ No newline at end of file
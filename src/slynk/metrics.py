@@ -0,0 +1,219 @@
+import time
+from typing import *
+
+
+class Histogram:
+    """Log-linear histogram in the style of HdrHistogram.
+
+    Values below `2**SUB_BUCKET_BITS` get a bucket each, above that every
+    power of two is split in `2**(SUB_BUCKET_BITS-1)` buckets, so any value
+    is known within about 3% while the buckets stay few."""
+    SUB_BUCKET_BITS = 5
+    __slots__ = ("counts", "total", "sum", "min", "max")
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def bucket(cls, value):
+        exponent = value.bit_length() - cls.SUB_BUCKET_BITS
+        if exponent <= 0:
+            return value
+        return (exponent << (cls.SUB_BUCKET_BITS - 1)) + (value >> exponent)
+
+    @classmethod
+    def bucket_range(cls, bucket):
+        half = 1 << (cls.SUB_BUCKET_BITS - 1)
+        if bucket < 2 * half:
+            return bucket, bucket + 1
+        exponent = bucket // half - 1
+        lower = (bucket - exponent * half) << exponent
+        return lower, lower + (1 << exponent)
+
+    def record(self, value):
+        value = int(value)
+        bucket = self.bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percentile):
+        if not self.total:
+            return None
+        threshold = self.total * percentile / 100
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= threshold:
+                lower, upper = self.bucket_range(bucket)
+                return min(max((lower + upper - 1) // 2, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.sum / self.total if self.total else None
+
+
+class RpcMetrics:
+    __slots__ = ("calls", "returns", "abandoned", "in_flight", "latency",
+                 "encode_time", "parse_time", "bytes_out", "bytes_in")
+
+    def __init__(self):
+        self.calls = 0
+        self.returns = 0
+        self.abandoned = 0
+        self.in_flight = 0
+        # In microseconds
+        self.latency = Histogram()
+        # In seconds
+        self.encode_time = 0.0
+        self.parse_time = 0.0
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+
+class MessageMetrics:
+    __slots__ = ("count", "bytes", "parse_time")
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.parse_time = 0.0
+
+
+def rpc_head(command):
+    """The operator of a rex command, e.g. `SLYNK:AUTODOC`."""
+    if not command:
+        return ""
+    if not isinstance(command, str):
+        head = command[0]
+        if isinstance(head, bytes):
+            head = head.decode("utf-8")
+        return str(head).upper()
+    return command.split(None, 1)[0].upper()
+
+
+class Metrics:
+    """Latency and throughput of the Slynk RPCs, per operator, and of
+    the incoming messages, per type.
+
+    Recording costs a couple of dict lookups and clock reads per message,
+    so it is meant to be left enabled."""
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        self.rpcs: Dict[str, RpcMetrics] = {}
+        self.messages: Dict[str, MessageMetrics] = {}
+        self.last_received = (0, 0.0)
+        self.last_message: Optional[MessageMetrics] = None
+        self.started = self.clock()
+
+    def rpc(self, command):
+        head = rpc_head(command)
+        try:
+            return self.rpcs[head]
+        except KeyError:
+            metrics = self.rpcs[head] = RpcMetrics()
+            return metrics
+
+    def request_sent(self, request, encode_time, size):
+        metrics = self.rpc(request.command)
+        metrics.calls += 1
+        metrics.in_flight += 1
+        metrics.encode_time += encode_time
+        metrics.bytes_out += size
+        request.sent_at = self.clock()
+
+    def request_returned(self, request):
+        """To be called while handling the `:return`, so that it is
+        accounted with the message just received.
+        Requests sent while disabled have no `sent_at` and are ignored."""
+        if request.sent_at is None:
+            return
+        metrics = self.rpc(request.command)
+        metrics.returns += 1
+        metrics.in_flight -= 1
+        size, parse_time = self.last_received
+        metrics.bytes_in += size
+        metrics.parse_time += parse_time
+        metrics.latency.record((self.clock() - request.sent_at) * 1e6)
+
+    def request_abandoned(self, request):
+        if request.sent_at is None:
+            return
+        metrics = self.rpc(request.command)
+        metrics.abandoned += 1
+        metrics.in_flight -= 1
+
+    def message_received(self, command, size, parse_time):
+        self.last_received = (size, parse_time)
+        try:
+            metrics = self.messages[command]
+        except KeyError:
+            metrics = self.messages[command] = MessageMetrics()
+        metrics.count += 1
+        metrics.bytes += size
+        metrics.parse_time += parse_time
+        self.last_message = metrics
+
+    def parsed_late(self, parse_time):
+        """Accounts parsing left over from the message just received,
+        such as a lazy `:return` value decoded after all."""
+        size, previous = self.last_received
+        self.last_received = (size, previous + parse_time)
+        if self.last_message is not None:
+            self.last_message.parse_time += parse_time
+
+    def report(self) -> str:
+        def ms(microseconds):
+            return "-" if microseconds is None else f"{microseconds / 1000:.2f}"
+
+        elapsed = self.clock() - self.started
+        lines = [f"Slynk RPC statistics over {elapsed:.1f} s "
+                 "(latencies in ms, encode/parse totals in ms, sizes in bytes)",
+                 "",
+                 f"{'RPC':<44}{'calls':>7}{'fly':>5}{'abnd':>5}"
+                 f"{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}"
+                 f"{'encode':>9}{'parse':>9}{'out':>11}{'in':>11}"]
+        for head, metrics in sorted(self.rpcs.items(),
+                                    key=lambda item: -item[1].latency.sum):
+            latency = metrics.latency
+            lines.append(
+                f"{head[:43]:<44}{metrics.calls:>7}{metrics.in_flight:>5}"
+                f"{metrics.abandoned:>5}"
+                f"{ms(latency.percentile(50)):>9}{ms(latency.percentile(90)):>9}"
+                f"{ms(latency.percentile(99)):>9}{ms(latency.max):>9}"
+                f"{metrics.encode_time * 1000:>9.2f}{metrics.parse_time * 1000:>9.2f}"
+                f"{metrics.bytes_out:>11}{metrics.bytes_in:>11}")
+        lines += ["",
+                  f"{'Message':<44}{'count':>7}{'per s':>9}"
+                  f"{'parse':>9}{'bytes':>11}"]
+        for command, metrics in sorted(self.messages.items(),
+                                       key=lambda item: -item[1].count):
+            lines.append(
+                f"{str(command)[:43]:<44}{metrics.count:>7}"
+                f"{metrics.count / elapsed if elapsed else 0:>9.1f}"
+                f"{metrics.parse_time * 1000:>9.2f}{metrics.bytes:>11}")
+        return "\n".join(lines)
@@ -0,0 +1,166 @@
+"""
+Capture and replay of the raw Slynk byte stream.
+
+A recording is a magic line followed by one record per chunk as it went
+over the socket: the direction (`<` received, `>` sent), the seconds
+since the recording started, the length and then the bytes themselves.
+It is what `docs/socket-inspector.l` prints, but written by the client.
+"""
+import asyncio, struct, time
+from typing import *
+
+try:
+    from .client import SlynkClientProtocol, RECEIVED, SENT
+except ImportError as e:
+    from client import SlynkClientProtocol, RECEIVED, SENT
+
+MAGIC = b"SLYREC1\n"
+RECORD_HEADER = struct.Struct("!cdI")
+
+
+class Recorder:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.started = time.perf_counter()
+
+    def record(self, direction, data):
+        if self.file is None:
+            return
+        self.file.write(RECORD_HEADER.pack(
+            direction, time.perf_counter() - self.started, len(data)))
+        self.file.write(data)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def read_recording(path) -> Iterator[Tuple[bytes, float, bytes]]:
+    """Yields the `(direction, time, data)` records of a recording."""
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a Slynk recording")
+        while header := file.read(RECORD_HEADER.size):
+            direction, elapsed, length = RECORD_HEADER.unpack(header)
+            yield direction, elapsed, file.read(length)
+
+
+def write_recording(path, records):
+    """Writes `(direction, time, data)` records, e.g. synthetic traffic."""
+    with open(path, "wb") as file:
+        file.write(MAGIC)
+        for direction, elapsed, data in records:
+            file.write(RECORD_HEADER.pack(direction, elapsed, len(data)))
+            file.write(data)
+
+
+class MessageCollector:
+    def __init__(self):
+        self.messages = []
+
+    def on_reception(self, data):
+        self.messages.append(bytes(data))
+
+
+def frames(chunks):
+    """Splits the `(time, data)` chunks of one direction into messages.
+
+    Returns `(time, message)` pairs, a message being timed by the chunk
+    that completed it."""
+    protocol = SlynkClientProtocol()
+    collector = MessageCollector()
+    protocol.bind(reception=collector.on_reception)
+    result = []
+    for elapsed, data in chunks:
+        protocol.data_received(data)
+        result += [(elapsed, message) for message in collector.messages]
+        collector.messages.clear()
+    return result
+
+
+class Script:
+    """A recording as the replay server sees it: the chunks to send back,
+    each waiting for a number of messages from the client."""
+    def __init__(self, records):
+        records = list(records)
+        self.sent = frames((elapsed, data) for direction, elapsed, data in records
+                           if direction == SENT)
+        self.received = frames((elapsed, data) for direction, elapsed, data in records
+                               if direction == RECEIVED)
+        self.sent_times = [elapsed for elapsed, __ in self.sent]
+        self.received_times = [elapsed for elapsed, __ in self.received]
+        # (time, messages the client had sent by then, data)
+        self.replies = []
+        index = 0
+        for direction, elapsed, data in records:
+            if direction == SENT:
+                continue
+            while index < len(self.sent_times) and self.sent_times[index] <= elapsed:
+                index += 1
+            self.replies.append((elapsed, index, data))
+        # (time, messages the client had received by then, message)
+        self.requests = []
+        index = 0
+        for elapsed, message in self.sent:
+            while index < len(self.received_times) and self.received_times[index] < elapsed:
+                index += 1
+            self.requests.append((elapsed, index, message))
+
+    @classmethod
+    def load(cls, path):
+        return cls(read_recording(path))
+
+
+class ReplayServerProtocol(SlynkClientProtocol):
+    """Stands in for Slynk: plays back the received side of a recording
+    whenever the client has sent as many messages as it had back then.
+
+    The pauses of the recording are multiplied by `time_scale`, 0 plays
+    everything as fast as the client allows."""
+    def __init__(self, script, time_scale=1.0, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.script = script
+        self.time_scale = time_scale
+        self.messages_received = 0
+        self.progress = None
+        self.task = None
+        self.bind(reception=self.on_message)
+
+    def connection_made(self, transport):
+        super().connection_made(transport)
+        self.progress = asyncio.Event()
+        self.task = asyncio.ensure_future(self.play())
+
+    def connection_lost(self, something):
+        super().connection_lost(something)
+        if self.task is not None:
+            self.task.cancel()
+
+    def on_message(self, data):
+        self.messages_received += 1
+        self.progress.set()
+
+    async def play(self):
+        previous = 0.0
+        for elapsed, needed, data in self.script.replies:
+            while self.messages_received < needed:
+                self.progress.clear()
+                await self.progress.wait()
+            if needed:
+                previous = max(previous, self.script.sent_times[needed - 1])
+            delay = (elapsed - previous) * self.time_scale
+            if delay > 0:
+                await asyncio.sleep(delay)
+            previous = elapsed
+            self.transport.write(data)
+        self.transport.close()
+
+
+async def serve_replay(script, host="localhost", port=0, time_scale=1.0):
+    """Starts a replay server, the port is in `server.sockets[0]`."""
+    loop = asyncio.get_event_loop()
+    return await loop.create_server(
+        lambda: ReplayServerProtocol(script, time_scale), host, port)
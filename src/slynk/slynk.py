@@ -1,16 +1,23 @@
-import asyncio, threading, pathlib
+import asyncio, threading, pathlib, inspect, functools
+from collections import OrderedDict
 
 try:
     from .util import *
     from .structs import *
     from .client import *
     from . import inspector, documentation, profiling, debug
+    from .metrics import Metrics, rpc_head
+    from .recording import Recorder
+    from .completion_cache import CompletionCache
 except ImportError as e:
     print(f"ImportError encoutered, switching gears: {e}")
     from util import *
     from structs import *
     from client import *
     from . import inspector, documentation, profiling, debug
+    from metrics import Metrics, rpc_head
+    from recording import Recorder
+    from completion_cache import CompletionCache
 
 class SlynkClient(
         Dispatcher,
@@ -54,108 +61,306 @@ class SlynkClient(
         self.repls = []
         self.connexion_info = None
         self.current_inspector = None
+        # Inspector -> `InspectionPages`
+        self.inspection_pages = {}
+        # Incoming message keyword -> handler, gathered from the mixins
+        self.message_handlers = {}
+        self.metrics = Metrics()
+        self.recorder = None
+        self.completion_cache = CompletionCache()
+        self.autodoc_cache = OrderedDict()
+        self.autodoc_task = None
+        # Counts `definitions_changed`, for caches kept by the views
+        self.evaluations = 0
+        # (thread, level, frame, kind) -> future of a `debug_frame_rex`
+        self.frame_cache = {}
+        # Thread -> task of `debug_prefetch_frames`
+        self.debug_prefetches = {}
+        for klass in reversed(type(self).__mro__):
+            for attribute in vars(klass).values():
+                for command in getattr(attribute, "handled_commands", ()):
+                    self.register_message_handler(
+                        command, getattr(self, attribute.__name__))
 
     async def connect(self, *args):
+        await self.open_connexion(*args)
+        await self.update_connexion_info()
+
+    async def open_connexion(self, *args):
+        """Connects without exchanging anything with Slynk yet."""
         if len(args) > 0:
             self.loop = args[0]
         else:
             self.loop = asyncio.new_event_loop()
             threading.Thread(target=self.loop.run_forever)
         self.connexion = SlynkClientProtocol()
+        self.connexion.recorder = self.recorder
         self.connexion.bind(connect=self.handle_connect,
                             disconnect=self.handle_close,
                             reception=self.handle_read,
                             __aio_loop__=self.loop)
+        self.closed_future = self.loop.create_future()
         await self.loop.create_connection(lambda: self.connexion,
                                           self.host, self.port)
-        await self.update_connexion_info()
-        self.closed_future = self.loop.create_future()
+
+    def start_recording(self, path):
+        """Captures the raw traffic to `path`, for `recording.ReplayServerProtocol`."""
+        self.stop_recording()
+        self.recorder = Recorder(path)
+        if self.connexion:
+            self.connexion.recorder = self.recorder
+
+    def stop_recording(self):
+        if self.recorder is None:
+            return
+        if self.connexion:
+            self.connexion.recorder = None
+        self.recorder.close()
+        self.recorder = None
 
     async def closed(self):
         await self.closed_future
         return self.closed_future.result()
 
     def send_message(self, message):
-        self.connexion.write(message)
+        return self.connexion.write(message)
+
+    def send_form(self, form):
+        """Sends a form built with `call`, serialized into the frame."""
+        return self.send_message(dump_bytes(form, SlynkClientProtocol.new_frame()))
 
     def handle_connect(self):
         self.connected = True
         self.emit("connect")
 
     def handle_close(self, something):
+        # Nothing will answer the pending requests any more
+        pending = self.request_table
+        self.request_table = {}
+        for request in pending.values():
+            self.metrics.request_abandoned(request)
+            if not request.future.done():
+                request.future.set_exception(
+                    ConnectionResetError(f"Slynk connexion lost before answering {rpc_head(request.command)}"))
+        # The inspections paged belong to the Lisp that went away
+        self.inspection_pages = {}
         if self.connected:
             self.connected = False
             self.closed_future.set_result(True)
             self.emit("disconnect")
 
+    def register_message_handler(self, command, handler):
+        """Makes `handler` receive the incoming messages of type `command`.
+
+        This is the extension point for plugins, `command` is a keyword
+        such as `":write-string"` and `handler` may be a coroutine."""
+        self.message_handlers[command_key(command)] = handler
+
+    def unknown_message_handler(self, expression):
+        print(f"Danger, unknown command: {expression}")
+
     async def handle_read(self, data):
-        expression = loads(data.decode("utf-8"))
-        command = str(expression[0]).lower()[1:]  # This should be a keyword symbol
-        parameter = expression[1]
-        if command == "return":
-            self.rex_return_handler(expression)
-        elif command == "write-string":
-            self.emit("write_string", parameter)
-        elif command == "presentation-start":
-            self.emit("presentation_start", parameter)
-        elif command == "presentation-end":
-            self.emit("presentation_end", parameter)
-        elif command == "new-package":
-            self.emit("new_package", parameter)
-        elif command == "debug":
-            self.debug_setup_handler(expression)
-        elif command == "debug-activate":
-            self.debug_activate_handler(expression)
-        elif command == "debug-return":
-            self.debug_return_handler(expression)
-        elif command == "read-from-minibuffer":
-            await self.read_from_minibuffer_handler(expression)
-        elif command == "y-or-n-p":
-            await self.y_or_n_handler(expression)
-        elif command == "read-string":
-            await self.read_string_handler(expression)
-        elif command == "read-aborted":
-            self.read_aborted_handler(expression)
-        elif command == "ping":
-            self.ping_handler(expression)
-        elif command == "channel-send":
-            self.channels[parameter].message_recieved(expression[2])
-        elif command == "indentation-update":
-            self.connexion_info.indentation = parameter
-            self.emit("indentation_update", parameter)
+        metrics = self.metrics
+        if metrics.enabled:
+            start = metrics.clock()
+            expression = parse_message(data)
+            metrics.message_received(expression[0], len(data), metrics.clock() - start)
         else:
-            print("Danger, unknown command: " + expression)
+            expression = parse_message(data)
+        command = expression[0]  # This should be a keyword symbol
+        try:
+            handler = self.message_handlers[command]
+        except KeyError:
+            # Only the first message of a given spelling gets here
+            handler = self.message_handlers.get(command_key(command))
+            if handler is None:
+                handler = self.unknown_message_handler
+            else:
+                self.message_handlers[command] = handler
+        result = handler(expression)
+        if inspect.isawaitable(result):
+            await result
+
+    @handles(":write-string")
+    def write_string_handler(self, expression):
+        self.emit("write_string", expression[1])
+
+    @handles(":presentation-start")
+    def presentation_start_handler(self, expression):
+        self.emit("presentation_start", expression[1])
+
+    @handles(":presentation-end")
+    def presentation_end_handler(self, expression):
+        self.emit("presentation_end", expression[1])
+
+    @handles(":new-package")
+    def new_package_handler(self, expression):
+        self.definitions_changed()
+        self.emit("new_package", expression[1])
+
+    @handles(":channel-send")
+    def channel_send_handler(self, expression):
+        self.channels[expression[1]].message_recieved(expression[2])
+
+    @handles(":indentation-update")
+    def indentation_update_handler(self, expression):
+        self.connexion_info.indentation = expression[1]
+        self.emit("indentation_update", expression[1])
+
+    def definitions_changed(self):
+        """Forgets what was cached about the Lisp image's symbols, after
+        an evaluation that may have changed them or anything else."""
+        self.evaluations += 1
+        self.completion_cache.invalidate()
+        self.autodoc_cache.clear()
 
     def make_channel(self):
         id = len(self.channels)
         self.channels.append(Channel(self, id))
         return id, self.channels[id]
 
+    @handles(":ping")
     def ping_handler(self, expression):
-        self.send_message("(:EMACS-PONG " + str(expression[1]) + " " + str(expression[2]) + ")")
+        self.send_form(call(":EMACS-PONG", expression[1], expression[2]))
+
+    def rex_request(self, command, thread="T", package=DEFAULT_PACKAGE, lazy=False):
+        """Registers a request, returns its message and the `PromisedRequest`
+        whose future is set when Slynk returns.
+
+        `command` is a form built with `call`, which is serialized straight
+        into the message, or the text of the form without its parentheses.
+        With `lazy` a large list result is returned as a `LazyList`, for
+        callers that may only look at part of it.
 
-    async def rex(self, command, thread="T", package=DEFAULT_PACKAGE):
+        Cancelling the future abandons the request, see `abandon_request`."""
         id = self.request_counter
         self.request_counter += 1
-        message = f"(:EMACS-REX ({command}) {dumps(package)} {str(thread)} {str(id)})"
-        self.send_message(message)
-        # This future will be returned when emacs returns.
+        message = SlynkClientProtocol.new_frame()
+        if isinstance(command, str):
+            message += f"(:EMACS-REX ({command}) ".encode("utf-8")
+        else:
+            message += b"(:EMACS-REX "
+            dump_bytes(command, message)
+            message += b" "
+        message += f"{dumps(package)} {str(thread)} {str(id)})".encode("utf-8")
         future = self.loop.create_future()
-        request = PromisedRequest(id, command, package, future)
+        request = PromisedRequest(id, command, package, future, thread, lazy=lazy)
         self.request_table[request.id] = request
-        await future
+        future.add_done_callback(functools.partial(self.rex_done_callback, request))
+        return message, request
+
+    def rex_done_callback(self, request, future):
+        if future.cancelled():
+            self.abandon_request(request)
+
+    def abandon_request(self, request):
+        """Forgets `request` and interrupts the thread evaluating it.
+
+        Requests sent to thread T run in whichever worker thread Slynk
+        spawns, which we do not know, so those are left to finish."""
+        if self.request_table.pop(request.id, None) is None:
+            return
+        self.metrics.request_abandoned(request)
+        if self.connected and str(request.thread).upper() != "T":
+            self.interrupt(request.thread)
+
+    @staticmethod
+    def remaining_time(timeout, deadline, loop):
+        """Combines a relative `timeout` with an absolute `deadline`,
+        in `loop.time()` terms, into the time left, or None for no limit."""
+        if deadline is not None:
+            remaining = deadline - loop.time()
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return timeout
+
+    async def rex(self, command, thread="T", package=DEFAULT_PACKAGE, timeout=None, deadline=None,
+                  lazy=False):
+        """Evaluates `command` in Slynk and returns the result.
+
+        `timeout` (seconds) and `deadline` (in `loop.time()` terms) are
+        optional; when they pass `asyncio.TimeoutError` is raised and the
+        request is abandoned, as it is when the caller is cancelled.
+        Helpers forward both to every `rex` they make.  See `rex_request`
+        for `lazy`."""
+        metrics = self.metrics
+        start = metrics.clock()
+        message, request = self.rex_request(command, thread, package, lazy)
+        size = self.send_message(message)
+        if metrics.enabled:
+            metrics.request_sent(request, metrics.clock() - start, size)
+        # This future will be returned when emacs returns.
+        future = request.future
+        timeout = self.remaining_time(timeout, deadline, self.loop)
+        if timeout is None:
+            await future
+        else:
+            await asyncio.wait_for(future, timeout)
         return future.result()
 
+    def send_messages(self, messages):
+        return self.connexion.write_many(messages)
+
+    def rex_futures(self, commands, thread="T", package=DEFAULT_PACKAGE):
+        """Sends all `commands` in a single write and returns their futures,
+        in order, for use with `asyncio.gather`, `asyncio.as_completed` etc.
+
+        A command may be a tuple, in which case it is used as the arguments
+        of `rex` instead of `thread` and `package`."""
+        metrics = self.metrics
+        start = metrics.clock()
+        messages = []
+        requests = []
+        for command in commands:
+            if isinstance(command, tuple):
+                message, request = self.rex_request(*command)
+            else:
+                message, request = self.rex_request(command, thread, package)
+            messages.append(message)
+            requests.append(request)
+        sizes = self.send_messages(messages)
+        if metrics.enabled and requests:
+            # The encoding is done as a batch, so its cost is shared out
+            encode_time = (metrics.clock() - start) / len(requests)
+            for request, size in zip(requests, sizes):
+                metrics.request_sent(request, encode_time, size)
+        return [request.future for request in requests]
+
+    async def rex_many(self, commands, thread="T", package=DEFAULT_PACKAGE,
+                       return_exceptions=False, timeout=None, deadline=None):
+        """Like `rex` for several commands at once, which costs one round trip
+        instead of one per command. Results are in the order of `commands`."""
+        futures = self.rex_futures(commands, thread, package)
+        timeout = self.remaining_time(timeout, deadline, self.loop)
+        try:
+            if futures and timeout is not None:
+                __, pending = await asyncio.wait(futures, timeout=max(timeout, 0))
+                if pending:
+                    raise asyncio.TimeoutError()
+            return await asyncio.gather(*futures, return_exceptions=return_exceptions)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            for future in futures:
+                future.cancel()
+            raise
+
+    @handles(":return")
     def rex_return_handler(self, expression):
-        status = str(expression[1][0]).lower()
         return_value = expression[1][1]
         id = int(expression[2])
         if id in self.request_table:
             request = self.request_table[id]
             del self.request_table[id]
-            if request.future.cancelled():
+            metrics = self.metrics
+            if type(return_value) is LazyList and not request.lazy and not request.future.done():
+                start = metrics.clock()
+                return_value = return_value.materialize()
+                if metrics.enabled:
+                    metrics.parsed_late(metrics.clock() - start)
+            metrics.request_returned(request)
+            if request.future.done():
                 return
             request.future.set_result(return_value)
+        elif id < self.request_counter:
+            pass  # An abandoned request, see `abandon_request`
         else:
             print(str(self.request_table))
             print(f"Danger, received rex response for unknown command id {id}")
@@ -169,24 +374,28 @@ class SlynkClient(
         await future
         return future.result()
 
+    @handles(":read-from-minibuffer")
     async def read_from_minibuffer_handler(self, expression):
         thread, tag, prompt, initial_value = extract_question_properties(expression)
         try:
             answer = await self._futured_emit("read_from_minibuffer", prompt, initial_value)
         except asyncio.CancelledError:
             answer = "NIL"
-        self.send_message(f"(:EMACS-RETURN {thread} {tag} {dumps(answer)})")
+        self.send_form(call(":EMACS-RETURN", thread, tag, answer))
 
+    @handles(":y-or-n-p")
     async def y_or_n_handler(self, expression):
         thread, tag, prompt, initial_value = extract_question_properties(expression)
         answer = await self._futured_emit("y_or_n_p", prompt)
-        self.send_message(f"(:EMACS-RETURN {thread} {tag} {dumps(answer)})")
+        self.send_form(call(":EMACS-RETURN", thread, tag, answer))
 
+    @handles(":read-string")
     async def read_string_handler(self, expression):
         thread, tag = extract_properties(expression)
         string = await self._futured_emit("read_string", tag)
-        self.send_message(f"(:EMACS-RETURN-STRING {thread} {tag} {dumps(string)})")
+        self.send_form(call(":EMACS-RETURN-STRING", thread, tag, string))
 
+    @handles(":read-aborted")
     def read_aborted_handler(self, expression):
         thread, tag = extract_properties(expression)
         self.emit("read_aborted", tag)
@@ -195,22 +404,20 @@ class SlynkClient(
     async def require(self, modules):
         if type(modules) != list:
             modules = [modules]  # Only one module
-        command = f"SLYNK:SLYNK-REQUIRE '{dumps(modules)}"
-        result = await self.rex(command, "T", "NIL")
+        result = await self.rex(call("SLYNK:SLYNK-REQUIRE", quote(modules)), "T", "NIL")
         return result
 
     async def add_load_paths(self, paths):
         if type(paths) != list:
             paths = [paths]
-        command = f"SLYNK:SLYNK-ADD-LOAD-PATHS '{dumps(paths)}"
-        result = await self.rex(command, "T")
+        result = await self.rex(call("SLYNK:SLYNK-ADD-LOAD-PATHS", quote(paths)), "T")
         return result
 
     ### Higher-level commands
     async def create_repl(self, information_needed=False):
         id, channel = self.make_channel()
         repl = Repl(channel)
-        information = await self.rex(f"slynk-mrepl:create-mrepl {id}", "T")
+        information = await self.rex(call("slynk-mrepl:create-mrepl", id), "T")
         self.repls.append(repl)
         if information_needed:
             return repl, information
@@ -233,28 +440,30 @@ class SlynkClient(
 
     async def eval(self, expression_string, is_region, *args, **kwargs):
         mode = "-REGION" if is_region else ""
-        command = f"SLYNK:INTERACTIVE-EVAL{mode} {dumps(expression_string)}"
+        command = call(f"SLYNK:INTERACTIVE-EVAL{mode}", expression_string)
         result = await self.rex(command, "T", *args, **kwargs)
+        self.definitions_changed()
         return result
 
     async def compile_string(self, string, buffer_name, file_name, position, stickers=None,
                              compilation_policy="'NIL", *args, **kwargs):
         if type(position) == tuple and len(position) > 2:
-            position = f"(:POSITION {position[0]}) (:LINE {position[1]} {position[2]})"
+            position = [[keyword("POSITION"), position[0]],
+                        [keyword("LINE"), position[1], position[2]]]
         else:
-            position = f"(:POSITION {position})"
-
-        command = " ".join(
-            (["SLYNK:COMPILE-STRING-FOR-EMACS"] if not stickers else [
-                    "slynk-stickers:compile-for-stickers", 
-                    dumps(Quoted(stickers))])
-            + [dumps(string),
-               dumps(buffer_name),
-               f"(QUOTE ({position}))",
-               dumps(file_name),
-               str(compilation_policy)])
+            position = [[keyword("POSITION"), position]]
+
+        # The (possibly huge) source is escaped only once, into the message
+        arguments = [string, buffer_name, quote(position), file_name,
+                     Raw(str(compilation_policy))]
+        if stickers:
+            command = call("slynk-stickers:compile-for-stickers", quote(stickers), *arguments)
+        else:
+            command = call("SLYNK:COMPILE-STRING-FOR-EMACS", *arguments)
   
         result = await self.rex(command, "T", *args, **kwargs)
+        # Requests answered meanwhile may predate the new definitions
+        self.definitions_changed()
 
         if stickers:
             stickers_stuck = result[0]
@@ -268,7 +477,8 @@ class SlynkClient(
         return result
 
     async def compile_file(self, file_name, should_load=True, *args, **kwargs):
-        result = await self.rex(f"SLYNK:COMPILE-FILE-FOR-EMACS {dumps(file_name)} {dumps(should_load)}", "T", *args, **kwargs)
+        result = await self.rex(call("SLYNK:COMPILE-FILE-FOR-EMACS", file_name, should_load), "T", *args, **kwargs)
+        self.definitions_changed()
         # result is (:compilation-result notes success duration load? output-pathname)
         indication = str(result[0]).lower()
         if indication == ":compilation-result":
@@ -278,19 +488,20 @@ class SlynkClient(
         return result
 
     async def load_file(self, file_name, *args, **kwargs):
-        result = await self.rex(f"SLYNK:LOAD-FILE {dumps(file_name)}", "T", *args, **kwargs)
+        result = await self.rex(call("SLYNK:LOAD-FILE", file_name), "T", *args, **kwargs)
+        self.definitions_changed()
         return result
 
-    def interrupt(self):
-        self.send_message(":EMACS-INTERRUPT :REPL-THREAD")
+    def interrupt(self, thread=":REPL-THREAD"):
+        self.send_form(call(":EMACS-INTERRUPT", Raw(str(thread))))
 
     async def quit(self):
-        result = await self.rex("SLYNK/BACKEND:QUIT-LISP", "T")
+        result = await self.rex(call("SLYNK/BACKEND:QUIT-LISP"), "T")
         return result
 
     def disconnect(self):
         print("Disconnect called")
-        self.send_message("(:emacs-channel-send 1 (:teardown))")
+        self.send_form(call(":emacs-channel-send", 1, [keyword("teardown")]))
         self.loop.call_soon(self.connexion.transport.close)
 
     async def get_connexion_info(self):
@@ -299,7 +510,7 @@ class SlynkClient(
         def convert(property):
             return DictAsObject(property_list_to_dict(as_dict[property]))
 
-        data = await self.rex("SLYNK:CONNECTION-INFO", "T")
+        data = await self.rex(call("SLYNK:CONNECTION-INFO"), "T")
         as_dict = property_list_to_dict(data)
 
         # Pythonifying internal datastructures.
@@ -321,30 +532,57 @@ class SlynkClient(
         return self.connexion_info
 
     async def toggle_sticker_breaking(self, *args, **kwargs):
-        result = await self.rex("slynk-stickers:toggle-break-on-stickers", *args, **kwargs)
+        result = await self.rex(call("slynk-stickers:toggle-break-on-stickers"), *args, **kwargs)
         return result
 
     async def sticker_recording(self, key: str, ignored_ids: List[int], 
             should_ignore_zombies=False, zombies: List[int] = [], direction: int = 0, 
             command: str = "nil", *args, **kwargs):
         result = await self.rex(
-            f"""slynk-stickers:search-for-recording 
-                '{key} '{dumps(ignored_ids)} '{dumps(should_ignore_zombies)} 'nil {direction} '{command}""",
+            call("slynk-stickers:search-for-recording",
+                 quote(Raw(key)), quote(ignored_ids), quote(should_ignore_zombies),
+                 quote(symbol("nil")), direction, quote(Raw(command))),
             *args, **kwargs)
         return result
 
     async def sticker_fetch(self, dead_stickers: List[int], *args, **kwargs):
-        result = await self.rex(f"slynk-stickers:fetch '{dumps(dead_stickers)}")
+        result = await self.rex(call("slynk-stickers:fetch", quote(dead_stickers)))
         return result
 
     async def disassemble(self, symbol, *args, **kwargs):
-        result = await self.rex(f"slynk:disassemble-form {dumps(symbol)}", *args, **kwargs)
+        result = await self.rex(call("slynk:disassemble-form", symbol), *args, **kwargs)
         return result
 
-    async def xref(self, symbol: str, mode="calls", *args, **kwargs) -> List[Tuple[str, Location]]:
-        result = await self.rex(f"""slynk:xref ':{mode} '"{symbol}\"""", *args, **kwargs)
+    @staticmethod
+    def xref_command(symbol, mode):
+        return call("slynk:xref", quote(keyword(mode)), quote(symbol))
+
+    @staticmethod
+    def parse_xref(result):
         return [(name, parse_location(location)) for name, location in result]
 
+    async def xref(self, symbol: str, mode="calls", *args, **kwargs) -> List[Tuple[str, Location]]:
+        result = await self.rex(self.xref_command(symbol, mode), *args, **kwargs)
+        return self.parse_xref(result)
+
+    async def xrefs(self, symbol: str, modes, *args, **kwargs) -> List[List[Tuple[str, Location]]]:
+        """`xref` for each of `modes` in one round trip.
+        Modes that fail in Lisp, or whose answer cannot be parsed, have no
+        references."""
+        results = await self.rex_many(
+            [self.xref_command(symbol, mode) for mode in modes], *args,
+            return_exceptions=True, **kwargs)
+        references = []
+        for result in results:
+            if isinstance(result, BaseException):
+                references.append([])
+                continue
+            try:
+                references.append(self.parse_xref(result))
+            except Exception:
+                references.append([])
+        return references
+
 class TestListener:
     def __init__(self, client: SlynkClient, loop):
         self.client = client
@@ -15,6 +15,10 @@ class PromisedRequest:
     command: str
     package: str
     future: Any
+    thread: Any = None
+    sent_at: float = None
+    # Whether a large result may be returned as a `LazyList`
+    lazy: bool = False
 
 
 @dataclass
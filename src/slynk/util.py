@@ -1,4 +1,5 @@
-import queue
+import re
+from collections import deque
 from typing import *
 
 try: # Importing for ST
@@ -16,6 +17,45 @@ from .structs import *
 # So that all the mixins can access it.
 DEFAULT_PACKAGE = "COMMON-LISP-USER"
 
+def handles(*commands):
+    """Marks a method as the handler of the incoming Slynk `commands`.
+
+    Commands are keywords such as `":write-string"`; the method is
+    called with the whole message and may be a coroutine."""
+    def decorate(method):
+        method.handled_commands = commands
+        return method
+    return decorate
+
+def command_key(command):
+    return Symbol.intern(str.lower(command))
+
+# Building Slynk commands
+#
+# Commands are forms: lists made with `call` whose arguments are Python
+# values (str, int, bool, None, `Symbol`, lists, `quote`d forms...) that
+# `dump_bytes` serializes straight into the outgoing message.  Operators
+# and keywords are few and repeated, so their encoding is cached.
+
+_ENCODED_SYMBOLS: Dict[str, bytes] = {}
+
+def symbol(name) -> bytes:
+    try:
+        return _ENCODED_SYMBOLS[name]
+    except KeyError:
+        encoded = _ENCODED_SYMBOLS[name] = Symbol.quote(name).encode("utf-8")
+        return encoded
+
+def keyword(name) -> bytes:
+    return symbol(":" + name)
+
+def quote(form) -> Quoted:
+    return Quoted(form)
+
+def call(operator, *arguments) -> list:
+    """The form applying `operator`, a symbol name, to `arguments`."""
+    return [symbol(operator), *arguments]
+
 class Channel(Dispatcher):
     _events_ = ["message_recieved"]
     def __init__(self, slynk, id):
@@ -27,8 +67,25 @@ class Channel(Dispatcher):
         self.emit("message_recieved", argument)
 
     def send_message(self, message):
-        self.slynk.send_message(f"(:EMACS-CHANNEL-SEND {str(self.id)} {message})")
+        """Sends a form, or its text, over the channel."""
+        if isinstance(message, str):
+            message = Raw(message)
+        self.slynk.send_form(call(":EMACS-CHANNEL-SEND", self.id, message))
+
 
+# Characters of output kept for a paused REPL, the rest is dropped
+PAUSED_OUTPUT_LIMIT = 1 << 20
+
+class PausedOutput(list):
+    """Consecutive `:write-string`s received while paused."""
+
+class DroppedOutput:
+    """Output received while paused past the limit, of which only the size is kept."""
+    def __init__(self):
+        self.size = 0
+
+    def __str__(self):
+        return f"[{self.size} characters of output dropped while the REPL was closed]"
 
 class Repl(Dispatcher):
     _events_ = ["write_values",
@@ -39,19 +96,34 @@ class Repl(Dispatcher):
                 "open_dedicated_output_stream",
                 "clear_repl_history",
                 "server_side_repl_close",
+                "output_backlogged",
                 "unknown"]
 
-    def __init__(self, channel, send_events=False):
+    def __init__(self, channel, send_events=False, paused_output_limit=PAUSED_OUTPUT_LIMIT):
         self.channel = channel
         self.is_open = self.channel.is_open
         channel.bind(message_recieved=self.on_message)
-        self.queue = queue.SimpleQueue()
+        # Messages, `PausedOutput`s and `DroppedOutput`s received while paused
+        self.queue = deque()
+        self.paused_output_limit = paused_output_limit
+        self.paused_output_size = 0
+        self.dropping_output = False
         self.send_events = send_events
         self.read_mode = False
 
     def play_events(self):
-        while not self.queue.empty():
-            self.process_message(self.queue.get_nowait())
+        queue = self.queue
+        while queue:
+            entry = queue.popleft()
+            if type(entry) is PausedOutput:
+                for string in entry:
+                    self.emit("write_string", string)
+            elif type(entry) is DroppedOutput:
+                self.emit("write_string", str(entry))
+            else:
+                self.process_message(entry)
+        self.paused_output_size = 0
+        self.dropping_output = False
         self.send_events = True
 
     def pause_events(self):
@@ -60,21 +132,47 @@ class Repl(Dispatcher):
     def on_message(self, data):
         if self.send_events:
             self.process_message(data)
+        elif parse_symbol(data[0]) == "write_string":
+            self.queue_output(str(data[1]))
+        else:
+            self.queue.append(data)
+
+    def queue_output(self, string):
+        """Keeps `string` for when the REPL is played again, unless
+        `paused_output_limit` is reached.  The first string dropped emits
+        `output_backlogged`, for the client to slow the Lisp side down if
+        it can: Slynk's REPLs have no flow control of their own."""
+        last = self.queue[-1] if self.queue else None
+        if (self.dropping_output
+                or self.paused_output_size + len(string) > self.paused_output_limit):
+            if not self.dropping_output:
+                self.dropping_output = True
+                self.emit("output_backlogged")
+            if type(last) is not DroppedOutput:
+                last = DroppedOutput()
+                self.queue.append(last)
+            last.size += len(string)
+            return
+        self.paused_output_size += len(string)
+        if type(last) is PausedOutput:
+            last.append(string)
         else:
-            self.queue.put(data)
+            self.queue.append(PausedOutput((string,)))
 
     def process_message(self, data):
-        command = data[0].lower()[1:]
-        if command == "server-side-repl-close":
+        command = parse_symbol(data[0])
+        if command == "server_side_repl_close":
             self.print("Closed from serverside")
             self.channel.is_open = False
             self.is_open = False
-        elif command == "set-read-mode":
-            if data[1].lower() == ":read":
+        elif command == "set_read_mode":
+            if parse_symbol(data[1]) == "read":
                 self.read_mode = True
             else:
                 self.read_mode = False
-        command = command.replace("-", "_")
+        elif command == "write_values":
+            # The end of an evaluation
+            self.channel.slynk.definitions_changed()
         if command in self._events_:
             self.emit(command, *data[1:])
         else:
@@ -84,26 +182,110 @@ class Repl(Dispatcher):
     def process(self, input):
         if not self.read_mode:
             input = input.strip() # Remove trailing whitespace for whatever reason
-        self.channel.send_message(f"(:PROCESS {dumps(input)})")
+        self.channel.send_message(call(":PROCESS", input))
 
 
+# The default `parse_symbol` of the symbols seen so far, e.g.
+# `:WRITE-STRING` -> "write_string".  The parsers intern symbols, so the
+# lookups mostly succeed on identity and the keys are shared.
+_SYMBOL_KEYS: Dict[Symbol, str] = {}
+_SYMBOL_KEYS_LIMIT = 1 << 14
+
 def parse_symbol(key, lower_keys=True, remove_colon_from_keyword=True, replace_dash_with_underscore=True):
+    default = (type(key) is Symbol and lower_keys and remove_colon_from_keyword
+               and replace_dash_with_underscore)
+    if default:
+        try:
+            return _SYMBOL_KEYS[key]
+        except KeyError:
+            pass
+    symbol = key
     key = str(key)
     if remove_colon_from_keyword and key[0] == ":":
         key = key[1:]
     if replace_dash_with_underscore:
         key = key.replace("-", "_")
-    return key.lower() if lower_keys else key
+    key = key.lower() if lower_keys else key
+    if default and len(_SYMBOL_KEYS) < _SYMBOL_KEYS_LIMIT:
+        _SYMBOL_KEYS[symbol] = key
+    return key
 
 def property_list_to_dict(plist, *args):
-    return {parse_symbol(key, *args): value 
-            for key, value in zip(plist[::2], plist[1::2])}
+    items = iter(plist)
+    return {parse_symbol(key, *args): value for key, value in zip(items, items)}
 
 def association_list_to_dict(alist, preserve_list=False, *args):
     return {parse_symbol(values[0], *args): (values[1:] if preserve_list else values[1])
             for values in alist if values != []}
 
   # Slynk data parsing
+
+# Values of `:return` messages at least this large are decoded on demand
+LAZY_RETURN_SIZE = 64 << 10
+_RETURN_HEAD = re.compile(rb"\(:return\s+\(:ok\s+\(", re.I)
+_RETURN_TAIL = re.compile(rb"\)\s+(\d+)\s*\)\s*\Z")
+
+def parse_message(data):
+    """Parses an incoming message.
+
+    The list value of a large `(:return (:ok value) id)` is left as a
+    `LazyList`, so that the message is dispatched after reading its head
+    and tail only."""
+    if len(data) >= LAZY_RETURN_SIZE:
+        head = _RETURN_HEAD.match(data)
+        tail = head and _RETURN_TAIL.search(data, len(data) - 64)
+        if tail:
+            value = LazyList(data, head.end() - 1, tail.start())
+            return [Symbol.intern(":return"),
+                    [Symbol.intern(":ok"), value],
+                    int(tail.group(1))]
+    return loads_bytes(data)
+
+class LazySequence(Sequence):
+    """The items of a Slynk list, each decoded by `decode` the first time
+    it is looked at.
+
+    Over a `LazyList` showing the start of a long reply decodes only that
+    start; `len` still needs the whole list to be scanned."""
+    def __init__(self, items, decode):
+        self.items = items
+        self.decode = decode
+        self.decoded = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        try:
+            return self.decoded[index]
+        except KeyError:
+            item = self.decoded[index] = self.decode(self.items[index])
+            return item
+
+    def __iter__(self):
+        for index, item in enumerate(self.items):
+            try:
+                yield self.decoded[index]
+            except KeyError:
+                item = self.decoded[index] = self.decode(item)
+                yield item
+
+def parse_stack_frame(frame):
+    return StackFrame(int(frame[0]),
+                      str(frame[1]),
+                      True if len(frame) >= 3 and bool(frame[2][1]) else False)
+
+def parse_trace(trace):
+    return Trace(trace[0], trace[1],
+                 (trace[2][0], str(trace[2][2])),
+                 [argument[1] for argument in trace[3]],
+                 [returnee[1] for returnee in trace[4]],
+                 *trace[5:])
+
 def parse_position(raw_position):
     position = Position(raw_position[0][1:].lower())
 
@@ -186,26 +368,28 @@ def parse_compilation_information(expression):
         load=True if get_at(expression, 4) else False,
         path=get_at(expression, 5))
 
-def parse_inspection(inspection):
-    def parse_element(element):
-        if type(element) == list:
-            return DictAsObject(
-                # Remove colon from keyword
-                {"type": element[0][1:],
-                 "content": element[1],
-                 "index": element[2],
-                 # Primarily for debugging purposes
-                 "original_content": element})
-        return element
+def parse_inspection_element(element):
+    if isinstance(element, (list, LazyList)):
+        return DictAsObject(
+            # Remove colon from keyword
+            {"type": element[0][1:],
+             "content": element[1],
+             "index": element[2],
+             # Primarily for debugging purposes
+             "original_content": element})
+    return element
 
+def parse_inspection(inspection):
     inspection = InspectionData(**property_list_to_dict(inspection))
     [inspection.content, inspection.length, inspection.start, inspection.end] = inspection.content
-    inspection.content = [parse_element(element) for element in inspection.content]
+    inspection.content = LazySequence(inspection.content, parse_inspection_element)
     return inspection
 
 def extract_properties(expression):
-    thread = str(expression[1])
-    tag = str(expression[2])
+    """The thread and tag of a question, as sent: Slynk finds the thread
+    waiting for the answer by these numbers."""
+    thread = expression[1]
+    tag = expression[2]
     return thread, tag
 
 
@@ -8,12 +8,13 @@ from math import log, ceil, inf
 from . import ui_view as ui
 from .sexpdata import *
 from .sly import *
-from . import slynk, sexpdata
+from . import slynk, sexpdata, sly
 from .util import *
 from .html_dsl.elements import *
 from . import custom_elements as X
 from html import escape
 from .inspector import get_inspector
+from .slynk.debug import TraceStore
 # To enable passing strings by reference
 @dataclass
 class Reference:
@@ -69,7 +70,11 @@ class Tracer(ui.UIView):
         self.tracees_element = None
         self.output_element = None
         self.total_element = None
-        self.traces = []
+        self.traces = TraceStore()
+        # Ids of the traces whose subtree is hidden
+        self.collapsed = set()
+        # Position of the first trace shown, only `shown_traces` are
+        self.first = 0
         self.total_traces = 0
         self.name = "Sly: Tracer"
 
@@ -80,7 +85,7 @@ class Tracer(ui.UIView):
 
     async def design(self):
         self.html = HTML[BODY(_class="sly", id="sly-tracer")[
-            STYLE[load_resource("stylesheet.css")],
+            X.stylesheet(),
             DIV(_class="toolbar")[SPAN(_class="title")["Tracees"], " ",
                  X.BUTTON(href=self.url({"action": "untrace-all"}))["Untrace all"], " ",
                  X.BUTTON(href=self.url({"action": "refresh-tracees"}))["Refresh"], " ",
@@ -122,15 +127,89 @@ class Tracer(ui.UIView):
         await self.refresh_tracees()
 
     async def fetch(self, mode="next"):
-        remainder = inf
-        while remainder == inf or (mode == "all" and remainder > 0):
-            traces, remainder, __ = await self.slynk.tracer_report_partial_tree(
-                f"sublime-sly-tracer-{self.id}")
-            self.traces += traces
-            self.output_element[0] += "<br>" + self.render_as_tree(traces)
+        async for traces, remainder in self.slynk.tracer_stream_tree(
+                f"sublime-sly-tracer-{self.id}"):
+            shown = len(self.shown())
+            self.traces.extend(traces)
+            self.total_traces = len(self.traces) + remainder
+            self.total_element[0] = f"{len(self.traces)}/{self.total_traces}"
+            # Batches past the traces shown only change the count
+            if shown < self.shown_traces:
+                self.render()
+            self.flip()
+            if mode != "all":
+                break
 
     async def erase_output(self):
-        self.output_element[0] = " "
+        self.traces.clear()
+        self.collapsed.clear()
+        self.first = 0
+        self.render()
+
+    @property
+    def shown_traces(self):
+        return sly.settings().get("tracer", {}).get("shown_traces", 500)
+
+    def collapsed_ancestor(self, index):
+        """The position of the outermost collapsed ancestor of the trace at `index`."""
+        for ancestor in self.traces.ancestors(index):
+            if self.traces.ids[ancestor] in self.collapsed:
+                return ancestor
+
+    def visible(self, start, step=1):
+        """The positions of the traces not in a collapsed subtree, from
+        `start` on, going forward or backward according to `step`."""
+        traces = self.traces
+        if step > 0:
+            ancestor = self.collapsed_ancestor(start) if start < len(traces) else None
+            index = start if ancestor is None else traces.subtree_end(ancestor)
+            while index < len(traces):
+                yield index
+                index = (traces.subtree_end(index) if traces.ids[index] in self.collapsed
+                         else index + 1)
+        else:
+            index = start
+            while index >= 0:
+                ancestor = self.collapsed_ancestor(index)
+                if ancestor is not None:
+                    index = ancestor
+                yield index
+                index -= 1
+
+    def shown(self):
+        shown = []
+        for index in self.visible(self.first):
+            if len(shown) == self.shown_traces:
+                break
+            shown.append(index)
+        return shown
+
+    def show_previous(self):
+        previous = self.visible(self.first - 1, -1)
+        for __, index in zip(range(self.shown_traces), previous):
+            self.first = index
+        self.render()
+
+    def show_more(self):
+        shown = self.shown()
+        if shown and shown[-1] + 1 < len(self.traces):
+            self.first = shown[-1] + 1
+        self.render()
+
+    def toggle(self, trace_id):
+        self.collapsed.symmetric_difference_update((trace_id,))
+        self.render()
+
+    def render(self):
+        shown = self.shown()
+        hidden_before = self.first > 0 and next(self.visible(self.first - 1, -1), None) is not None
+        hidden_after = bool(shown) and next(self.visible(shown[-1] + 1), None) is not None
+        self.output_element[0] = "".join([
+            str(A(_class="sly-tracer-page", href=self.url({"action": "show-previous"}))[
+                "↑ Show previous traces"]) if hidden_before else "",
+            self.render_as_tree(shown) if shown else " ",
+            str(A(_class="sly-tracer-page", href=self.url({"action": "show-more"}))[
+                f"↓ Show more ({len(self.traces) - shown[-1] - 1} traces after)"]) if hidden_after else ""])
 
     async def on_url_press(self, action, index=None, trace_id=None, term_index=None, is_input_value=None, **rest):
       try:
@@ -146,12 +225,17 @@ class Tracer(ui.UIView):
             await self.refresh_tracees()
         elif action == "delete-output":
             await self.slynk.tracer_clear()
-            self.output_element[0] = " "
-            self.traces = []
+            await self.erase_output()
         elif action == "fetch-all":
             await self.fetch("all")
         elif action == "fetch-next":
             await self.fetch()
+        elif action == "show-previous":
+            self.show_previous()
+        elif action == "show-more":
+            self.show_more()
+        elif action == "toggle":
+            self.toggle(trace_id)
         elif action == "inspect":
             inspector = get_inspector(self.session, self.window, switch=True)
             await inspector.inspect_trace(trace_id, term_index, is_input_value)
@@ -172,34 +256,35 @@ class Tracer(ui.UIView):
                     escape(term)]]
             for i, term in enumerate(terms)]
 
-    def render_as_tree(self, data):
+    def render_as_tree(self, shown):
+        """The traces at the positions `shown`, drawn under their
+        ancestors even when those are not shown."""
+        traces = self.traces
         # To number each call
-        width = ceil(log(data[-1].id, 10)) + 2
-        prefixes = [SP * width]
-        previous_ids = []
+        width = ceil(log(max(traces.ids[-1], 1), 10)) + 2
+        # One per ancestor of the trace drawn, for its sibling lines
+        prefixes = [SP * width] + [Reference(SP * 4) for __ in range(traces.depths[shown[0]])]
         result: List[List[str]] = []
 
-        for vertex in data:
-            for previous_id in reversed(previous_ids):
-                if previous_id != vertex.parent_id:
-                    previous_ids.pop()
-                    prefixes.pop()
-                else:
-                    break
+        for index in shown:
+            id = traces.ids[index]
+            del prefixes[traces.depths[index] + 1:]
+            toggle = (str(A(_class="toggle", href=self.url({"action": "toggle", "trace_id": id}))[
+                         "▸" if id in self.collapsed else "▾"]) + SP if traces.has_children(index) else "")
             result.append(
-                [str(vertex.id).rjust(width).replace(" ", SP), 
+                [str(id).rjust(width).replace(" ", SP), 
                  *prefixes[1:-1], 
                  SP + SP + "├─ ", 
-                 SPAN(_class="function-name")[escape(vertex.spec[0])]])
+                 toggle,
+                 SPAN(_class="function-name")[escape(traces.spec(index)[0])]])
             if len(prefixes) > 1:
                 prefixes[-1].value = 2 * SP + "│" + SP
                 prefixes[-1] = Reference(4 * SP)
             prefixes += [Reference(2 * SP + "┃" + SP)]
-            inputs = self.prepare_terms(vertex.arguments, prefixes, "🠆 ", vertex.id, True)
-            outputs = self.prepare_terms(vertex.return_list, prefixes, "⤆ ", vertex.id, False)
+            inputs = self.prepare_terms(traces.arguments(index), prefixes, "🠆 ", id, True)
+            outputs = self.prepare_terms(traces.return_list(index), prefixes, "⤆ ", id, False)
             result += inputs + outputs
             prefixes[-1] = Reference(SP * 4)
-            previous_ids.append(vertex.id)
 
         return NL.join(["".join([str(reference) for reference in resultee]) 
                                          for resultee in result])
\ No newline at end of file
@@ -128,8 +128,17 @@ def safe_int(value: str) -> int:
         return None
 
 
+# The resources read so far.  Reloading the package runs this module
+# again, hence starts afresh with the resources as they are then.
+RESOURCES: Dict[str, str] = {}
+
 def load_resource(path):
-    return sublime.load_resource(f"Packages/{__name__.split('.')[0]}/{path}")
+    try:
+        return RESOURCES[path]
+    except KeyError:
+        resource = RESOURCES[path] = sublime.load_resource(
+            f"Packages/{__name__.split('.')[0]}/{path}")
+        return resource
 
 
 def add_regions_temporarily(view, regions, duration, *args):
@@ -269,7 +278,7 @@ def find_containing_form(view, point: int=None, max_iterations=1000) -> Optional
     start = find_extremity(point, -1, "parens.end", "parens.begin")
     end = find_extremity(point, 1, "parens.begin", "parens.end")
     # Plus one because regions are [x .. y) intervals
-    return Region(start, end+1) if start and end else None
+    return Region(start, end+1) if start is not None and end is not None else None
 
 
 def event_to_point(view, event: Dict[str, int]) -> Tuple[int]: